@@ -0,0 +1,452 @@
+'''
+Contains the driver code shared by the classification scripts, i.e. the
+command-line options, the pre-processing of graphs, and the repeated
+cross-validation loop. The scripts only specify how to fit a classifier
+for a single fold.
+'''
+
+
+import hashlib
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from os.path import dirname
+from os.path import exists
+
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import StratifiedKFold
+from sklearn.preprocessing import LabelEncoder
+
+from features import PersistentWeisfeilerLehman
+from features import WeisfeilerLehmanSubtree
+
+from utilities import cached_transform
+from utilities import read_graphs
+from utilities import read_labels
+
+
+def add_common_arguments(parser):
+    '''
+    Adds the command-line arguments that are shared by all scripts to
+    a parser.
+    '''
+
+    parser.add_argument(
+        'FILES', nargs='+', help='Input graphs (in some supported format)'
+    )
+
+    # Controls behaviour of the classifier (will be treated as
+    # a hyperparameter in the respective grid search scripts)
+    parser.add_argument(
+        '-b', '--balanced',
+        action='store_true', help='Make random forest classifier balanced'
+    )
+
+    parser.add_argument('-d', '--dataset', help='Name of data set')
+    parser.add_argument(
+        '-l', '--labels', type=str, help='Labels file', required=True
+    )
+
+    parser.add_argument(
+        '-n', '--num-iterations', default=3,
+        type=int, help='Number of Weisfeiler-Lehman iterations'
+    )
+
+    parser.add_argument(
+        '-c', '--use-cycle-persistence', action='store_true', default=False,
+        help='Indicates whether cycle persistence should be calculated or not'
+    )
+
+    parser.add_argument(
+        '-o', '--use-original-features', action='store_true', default=False,
+        help='Indicates that original features should be used as well'
+    )
+
+    parser.add_argument(
+        '-m', '--metric',
+        type=str, default='minkowski',
+        help='Metric to use for graph weight assignment'
+    )
+
+    parser.add_argument(
+        '-C', '--cache-dir',
+        type=str, default=None,
+        help='Directory for caching feature matrices across runs'
+    )
+
+    parser.add_argument(
+        '-R', '--resume-dir',
+        type=str, default=None,
+        help='Directory for storing the results of individual folds, '
+             'making it possible to resume interrupted runs'
+    )
+
+
+def setup_logger(args):
+    '''
+    Sets up logging to a file, whose name depends on the data set and
+    the number of iterations, and to `stderr`.
+
+    :return: Logger for the scripts
+    '''
+
+    logging.basicConfig(
+        level=logging.DEBUG,
+        filename='{}_{:02d}.log'.format(args.dataset, args.num_iterations)
+    )
+
+    logger = logging.getLogger('P-WL')
+
+    # Create a second stream handler for logging to `stderr`, but set
+    # its log level to be a little bit smaller such that we only have
+    # informative messages
+    stream_handler = logging.StreamHandler()
+    stream_handler.setLevel(logging.INFO)
+
+    # Use the default format; since we do not adjust the logger before,
+    # this is all right.
+    stream_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+    logger.addHandler(stream_handler)
+
+    return logger
+
+
+def read_data(args, logger):
+    '''
+    Reads all graphs and labels and ensures that the graphs are set up
+    equally.
+
+    :return: Graphs and encoded labels
+    '''
+
+    # Read all graphs and labels; there is no direct way of checking
+    # that the labels are 'correct' for the graphs, but at least the
+    # code will check that they have the same cardinality.
+    graphs = read_graphs(args.FILES, cache_dir=args.cache_dir)
+    labels = read_labels(args.labels)
+
+    for graph in graphs:
+        # Set the label to be uniform over all graphs in case no labels are
+        # available. This essentially changes our iteration to degree-based
+        # checks.
+        if 'label' not in graph.vs.attributes():
+            graph.vs['label'] = [0] * len(graph.vs)
+
+        # Reset edge weights if they already exist
+        if 'weight' in graph.es.attributes():
+            graph.es['weight'] = [0] * len(graph.es)
+
+    logger.info(
+        'Read {} graphs and {} labels'.format(len(graphs), len(labels))
+    )
+
+    assert len(graphs) == len(labels)
+
+    # Ensures that labels are encoded correctly, regardless of whether
+    # they are numerical or not.
+    y = LabelEncoder().fit_transform(labels)
+
+    return graphs, y
+
+
+def calculate_features(graphs, args, logger, **kwargs):
+    '''
+    Calculates the feature matrix of a set of graphs, using either the
+    persistent Weisfeiler--Lehman transformation or, if requested, the
+    original Weisfeiler--Lehman subtree features.
+
+    :param kwargs: Additional parameters for the persistent
+    Weisfeiler--Lehman transformation, such as the power of the metric
+
+    :return: Feature matrix and number of columns per iteration
+    '''
+
+    # This ignores *all* other feature generation methods and falls back
+    # to the original Weisfeiler--Lehman subtree kernel.
+    if getattr(args, 'use_subtree_features', False):
+
+        logger.info('Using original subtree features')
+
+        transformer = WeisfeilerLehmanSubtree()
+    else:
+        transformer = PersistentWeisfeilerLehman(
+                use_cycle_persistence=args.use_cycle_persistence,
+                use_original_features=args.use_original_features,
+                use_label_persistence=True,
+                metric=args.metric,
+                **kwargs
+        )
+
+    X, num_columns_per_iteration = \
+        cached_transform(
+            transformer, graphs, args.num_iterations, args.cache_dir
+        )
+
+    # Single precision is sufficient for the classifiers and the random
+    # forest would convert the matrix anyway; converting it once saves
+    # memory bandwidth in all subsequent folds.
+    X = X.astype(np.float32, copy=False)
+
+    logger.info('Finished persistent Weisfeiler-Lehman transformation')
+    logger.info(
+        'Obtained ({} x {}) feature matrix'.format(X.shape[0], X.shape[1])
+    )
+
+    return X, num_columns_per_iteration
+
+
+def resume_directory(args):
+    '''
+    Returns the directory in which the results of individual folds are
+    stored for the configuration of a run. The directory depends on all
+    command-line options, such that runs with different options never
+    share their results.
+
+    :return: Directory for storing fold results, or `None` if results
+    should not be stored
+    '''
+
+    if args.resume_dir is None:
+        return None
+
+    options = {
+        key: value for key, value in vars(args).items()
+        if key not in ['cache_dir', 'resume_dir']
+    }
+
+    key = hashlib.sha1(
+        json.dumps(options, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+    return os.path.join(args.resume_dir, '{}_{}'.format(args.dataset, key))
+
+
+def _to_json(value):
+    '''
+    Converts `numpy` scalars, which may occur in parameter dictionaries,
+    to their Python counterparts in order to serialize them.
+    '''
+
+    if isinstance(value, np.generic):
+        return value.item()
+    else:
+        return str(value)
+
+
+def run_cv(fit_and_predict, y, logger, n_repetitions=10, n_splits=10,
+           resume_dir=None, seed_repetitions=True, log_level=logging.DEBUG):
+    '''
+    Runs a repeated stratified cross-validation. For each fold, the
+    classification itself is delegated to a function, which is supposed
+    to be specialized to the options of the respective script, e.g. by
+    means of `functools.partial`.
+
+    :param fit_and_predict: Function that takes the indices of the
+    training and test samples of a fold as well as a random state for
+    the fold and returns the predictions for the test samples as well as
+    the parameters of the classifier. Any randomness within a fold, e.g.
+    the splits of an inner cross-validation, has to be derived from the
+    random state, so that the results of a fold do not depend on the
+    folds evaluated before. Otherwise, resumed runs would differ from
+    uninterrupted ones.
+    :param y: Labels
+    :param logger: Logger for reporting the accuracies
+    :param n_repetitions: Number of repetitions of the cross-validation
+    :param n_splits: Number of folds per repetition
+    :param resume_dir: Optional directory for storing the result of each
+    fold. Folds whose results already exist in this directory will not
+    be evaluated again.
+    :param seed_repetitions: If set, the splits of the ith repetition are
+    generated with a random state of i. Otherwise, the splits of all
+    repetitions are drawn one after the other from the global random
+    number generator, which has to be seeded by the caller.
+    :param log_level: Level for reporting the parameters of each fold
+
+    :return: Results of the individual folds and the mean accuracy of
+    each repetition
+    '''
+
+    mean_accuracies = []
+    fold_results = []
+
+    if resume_dir is not None:
+        os.makedirs(resume_dir, exist_ok=True)
+
+    # The splits of all repetitions only depend on the labels, so they
+    # are generated once before running the cross-validation.
+    if seed_repetitions:
+        splits = [
+            list(
+                StratifiedKFold(
+                    n_splits=n_splits, shuffle=True, random_state=i
+                ).split(np.zeros(len(y)), y)
+            )
+            for i in range(n_repetitions)
+        ]
+    else:
+        cv = StratifiedKFold(n_splits=n_splits, shuffle=True)
+        splits = [
+            list(cv.split(np.zeros(len(y)), y)) for _ in range(n_repetitions)
+        ]
+
+    for i, fold_splits in enumerate(splits):
+
+        # Contains accuracy scores for each cross validation step; the
+        # means of this list will be used later on.
+        accuracy_scores = []
+
+        for n, (train_index, test_index) in enumerate(fold_splits):
+
+            filename = None
+            if resume_dir is not None:
+                filename = os.path.join(
+                    resume_dir, '{:02d}_{:02d}.json'.format(i, n)
+                )
+
+            if filename is not None and os.path.exists(filename):
+                with open(filename) as f:
+                    result = json.load(f)
+
+                accuracy = result['accuracy']
+                params = result['params']
+
+                logger.debug('Loaded results of fold {} from {}'.format(
+                    n + 1, filename)
+                )
+            else:
+                y_pred, params = fit_and_predict(
+                    train_index, test_index, i * n_splits + n
+                )
+                accuracy = accuracy_score(y[test_index], y_pred)
+
+                # Write to a temporary file first such that an
+                # interrupted run never leaves incomplete results.
+                if filename is not None:
+                    with open(filename + '.tmp', 'w') as f:
+                        json.dump(
+                            {'accuracy': accuracy, 'params': params},
+                            f,
+                            default=_to_json
+                        )
+
+                    os.replace(filename + '.tmp', filename)
+
+            accuracy_scores.append(accuracy)
+
+            fold_results.append({
+                'params': params,
+                'fold': n + 1,
+                'it': i,
+                'acc': accuracy * 100,
+            })
+
+            logger.log(
+                log_level, 'Best parameters for this fold: {}'.format(params)
+            )
+
+        mean_accuracies.append(np.mean(accuracy_scores))
+        logger.info(
+            '  - Mean {}-fold accuracy: {:2.2f} [running mean over all '
+            'folds: {:2.2f}]'.format(
+                n_splits,
+                mean_accuracies[-1] * 100,
+                np.mean(mean_accuracies) * 100)
+        )
+
+    logger.info(
+        'Accuracy: {:2.2f} +- {:2.2f}'.format(
+            np.mean(mean_accuracies) * 100, np.std(mean_accuracies) * 100)
+    )
+
+    return fold_results, mean_accuracies
+
+
+def write_results(args, options, fold_results, mean_accuracies, logger):
+    '''
+    Appends the results of a cross-validation to the result file of
+    a script. Every fold is stored in a row of its own, followed by
+    a summary row containing the mean accuracy over all repetitions.
+
+    :param options: Names of command-line options to store
+    :param logger: Logger for reporting that the results could not be
+    appended to the requested file
+
+    :return: Name of the file to which the results have been written
+    '''
+
+    entry = {option: args.__dict__[option] for option in options}
+    entry['dataset'] = dirname(args.FILES[0]).split('/')[1]
+
+    # All folds share the same parameter names, so the columns of the
+    # result file are known in advance.
+    params = list(fold_results[0]['params']) if fold_results else []
+    columns = list(entry) + params + ['fold', 'it', 'acc', 'std']
+
+    cv_results = [
+        {
+            **entry,
+            **result['params'],
+            'fold': result['fold'],
+            'it': result['it'],
+            'acc': result['acc'],
+            'std': 0.0,
+        }
+        for result in fold_results
+    ]
+
+    # The summary row does not have any parameters
+    entry.update({param: '' for param in params})
+    entry['fold'] = 'all'
+    entry['it'] = 'all'
+    entry['acc'] = np.mean(mean_accuracies) * 100
+    entry['std'] = np.std(mean_accuracies) * 100
+    cv_results.append(entry)
+
+    result_file = _result_file(args.result_file, columns)
+
+    if result_file != args.result_file:
+        logger.warning(
+            'Columns of {} do not match the results; writing them to {} '
+            'instead'.format(args.result_file, result_file)
+        )
+
+    # Only write a header if the results are not appended to an
+    # existing file.
+    file_exists = exists(result_file)
+
+    pd.DataFrame.from_records(cv_results, columns=columns).to_csv(
+        result_file,
+        mode='a' if file_exists else 'w',
+        header=not file_exists,
+        index=False
+    )
+
+    return result_file
+
+
+def _result_file(filename, columns):
+    '''
+    Returns the file to which results with the given columns are
+    appended. Results are only appended to an existing file if its
+    header matches the columns; otherwise, e.g. if the classifier has
+    different parameters, a separate file whose name depends on the
+    columns is used.
+
+    :param filename: Requested result file
+    :param columns: Columns of the results
+
+    :return: Result file
+    '''
+
+    if not exists(filename) or \
+       list(pd.read_csv(filename, nrows=0).columns) == columns:
+        return filename
+
+    key = hashlib.sha1(json.dumps(columns).encode()).hexdigest()[:8]
+    root, ext = os.path.splitext(filename)
+
+    return '{}_{}{}'.format(root, key, ext)
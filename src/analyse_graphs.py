@@ -3,12 +3,13 @@
 import argparse
 import collections
 
-import igraph as ig
 import numpy as np
 
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+from utilities import read_graphs
+
 
 def read_labels(filename):
     labels = []
@@ -26,13 +27,13 @@ if __name__ == '__main__':
     
     args = parser.parse_args()
 
-    graphs = [ig.read(filename) for filename in args.FILES]
+    graphs = read_graphs(args.FILES)
     labels = read_labels(args.labels)
 
     cycles_per_label = collections.defaultdict(list)
 
     for graph, label in zip(graphs, labels):
-        num_connected_components = len(graph.components().subgraphs())
+        num_connected_components = len(graph.components())
         num_vertices = len(graph.vs)
         num_edges = len(graph.es)
         num_cycles = num_edges - num_vertices + num_connected_components 
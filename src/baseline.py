@@ -5,7 +5,6 @@
 
 
 import graphkernels as gk
-import igraph as ig
 import numpy as np
 
 from sklearn.svm import SVC
@@ -15,6 +14,8 @@ from sklearn.model_selection import StratifiedKFold
 import argparse
 import logging
 
+from utilities import read_graphs
+
 
 # TODO: shamelessly copied from `main.py`; should become a separate
 # function somewhere
@@ -38,7 +39,7 @@ if __name__ == '__main__':
     logging.basicConfig(level=logging.DEBUG)
     logger = logging.getLogger('Baseline')
 
-    graphs = [ig.read(filename) for filename in args.FILES]
+    graphs = read_graphs(args.FILES)
     labels = read_labels(args.labels)
 
     # Set the label to be uniform over all graphs in case no labels are
@@ -44,3 +44,40 @@ def jensen_shannon(p, q):
     '''
 
     return 0.5 * (kullback_leibler(p, q) + kullback_leibler(q, p))
+
+
+def pairwise_kullback_leibler(P, Q):
+    '''
+    Calculates the Kullback--Leibler divergence between all pairs of
+    rows of two matrices, following `kullback_leibler()`. Since the
+    logarithm of a quotient is a difference of logarithms, all pairs
+    can be evaluated using a single matrix product.
+
+    :param P: Matrix whose rows are discrete probability distributions
+    :param Q: Matrix whose rows are discrete probability distributions
+
+    :return: Matrix of Kullback--Leibler divergences, with one row for
+    every row of `P` and one column for every row of `Q`
+    '''
+
+    P = np.abs(P) + 1e-8
+    Q = np.abs(Q) + 1e-8
+
+    return P @ np.log(Q).T - np.sum(P * np.log(P), axis=1)[:, None]
+
+
+def pairwise_jensen_shannon(P, Q):
+    '''
+    Calculates the Jensen--Shannon divergence between all pairs of rows
+    of two matrices, following `jensen_shannon()`.
+
+    :param P: Matrix whose rows are discrete probability distributions
+    :param Q: Matrix whose rows are discrete probability distributions
+
+    :return: Matrix of Jensen--Shannon divergences, with one row for
+    every row of `P` and one column for every row of `Q`
+    '''
+
+    return 0.5 * (
+        pairwise_kullback_leibler(P, Q) + pairwise_kullback_leibler(Q, P).T
+    )
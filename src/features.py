@@ -8,6 +8,7 @@ import collections
 
 import igraph as ig
 import numpy as np
+import scipy.sparse
 
 from topology import PersistenceDiagram
 from topology import PersistenceDiagramCalculator
@@ -15,6 +16,7 @@ from topology import PersistenceDiagramCalculator
 from weisfeiler_lehman import WeisfeilerLehman
 
 from scipy.stats import entropy
+from sklearn.base import BaseEstimator
 from sklearn.base import TransformerMixin
 
 
@@ -51,18 +53,43 @@ class WeightAssigner:
         self._metric = metric_map[metric]
         self._smooth = smooth
 
+        # Cache of distances between pairs of neighbourhoods; the same
+        # pairs of multi-sets occur over and over again, both within a
+        # graph and across different graphs of a data set.
+        self._distances = {}
+
     def fit_transform(self, graph):
 
-        for edge in graph.es:
-            source, target = edge.tuple
+        # Query the labels of all vertices and the endpoints of all
+        # edges once instead of accessing them individually; the new
+        # weights are also assigned at once.
+        labels = graph.vs['label']
+        weights = []
+
+        for source, target in graph.get_edgelist():
 
-            source_labels = self._ensure_list(graph.vs[source]['label'])
-            target_labels = self._ensure_list(graph.vs[target]['label'])
+            source_labels = self._ensure_list(labels[source])
+            target_labels = self._ensure_list(labels[target])
 
             source_label = source_labels[0]
             target_label = target_labels[0]
 
-            weight = self._metric(source_labels[1:], target_labels[1:])
+            source_neighbours = source_labels[1:]
+            target_neighbours = target_labels[1:]
+
+            # Identical multi-sets, which includes two empty ones, are
+            # at distance zero for every metric except the uniform one,
+            # so there is no need to convert them to vectors at all.
+            if self._metric != self._uniform and \
+               source_neighbours == target_neighbours:
+                weight = 0.0
+            else:
+                key = (tuple(source_neighbours), tuple(target_neighbours))
+                weight = self._distances.get(key)
+
+                if weight is None:
+                    weight = self._metric(source_neighbours, target_neighbours)
+                    self._distances[key] = weight
 
             # For all non-uniform metrics, we want to take into account
             # the differences between the source and target label of an
@@ -70,12 +97,18 @@ class WeightAssigner:
             if self._metric != self._uniform:
                 weight = weight + (source_label != target_label) + self._tau
 
+            weights.append(weight)
+
+        if weights:
+
             # Update the edge weight if smoothing is required for the
             # distances.
             if self._smooth:
-                edge['weight'] += weight
-            else:
-                edge['weight'] = weight
+                weights = [
+                    w + weight for w, weight in zip(graph.es['weight'], weights)
+                ]
+
+            graph.es['weight'] = weights
 
         return graph
 
@@ -92,7 +125,7 @@ class WeightAssigner:
             return l
 
     def _angular(self, A, B):
-        a, b = self._to_vectors(A, B)
+        a, b = self._to_vectors(A, B, dtype=np.float64)
 
         denominator = np.linalg.norm(a) * np.linalg.norm(b)
 
@@ -124,7 +157,7 @@ class WeightAssigner:
         return self._kullback_leibler(A, B, lambda_=0.5)
 
     def _kullback_leibler(self, A, B, lambda_=1.0):
-        a, b = self._to_vectors(A, B)
+        a, b = self._to_vectors(A, B, dtype=np.float64)
 
         # Ensures that entries are valid
         a += 1
@@ -159,7 +192,7 @@ class WeightAssigner:
         return np.sum(np.abs(a - b)) / denominator
 
     @staticmethod
-    def _to_vectors(A, B):
+    def _to_vectors(A, B, dtype=np.float32):
         '''
         Transforms two sets of labels to their corresponding
         high-dimensional vectors. For example, a sequence of
@@ -172,6 +205,10 @@ class WeightAssigner:
 
         :param A: First label sequence
         :param B: Second label sequence
+        :param dtype: Data type of the vectors. Label counts are small
+        integers, so single precision is exact for them; metrics that
+        apply transcendental functions should request double precision
+        in order to keep the filtration order stable.
 
         :return: Two transformed vectors
         '''
@@ -183,8 +220,8 @@ class WeightAssigner:
                 label_to_index[label] = index
                 index += 1
 
-        a = np.zeros(len(label_to_index))
-        b = np.zeros(len(label_to_index))
+        a = np.zeros(len(label_to_index), dtype=dtype)
+        b = np.zeros(len(label_to_index), dtype=dtype)
 
         for label in A:
             a[label_to_index[label]] += 1
@@ -271,6 +308,11 @@ class PersistenceFeaturesGenerator:
         # features for each of the graphs, using the initial
         # configuration.
 
+        # The persistence diagrams of all graphs are independent of each
+        # other, so they are calculated in parallel.
+        pdc = PersistenceDiagramCalculator()
+        persistence_diagrams = pdc.fit_transform_many(graphs)
+
         for index, graph in enumerate(graphs):
 
             # Initially, all of these vectors are empty and will only be
@@ -281,8 +323,11 @@ class PersistenceFeaturesGenerator:
             x_cycle_persistence = []
             x_original_features = []
 
-            pdc = PersistenceDiagramCalculator()
-            persistence_diagram, edge_indices_cycles = pdc.fit_transform(graph)
+            persistence_diagram, edge_indices_cycles = \
+                persistence_diagrams[index]
+
+            # Labels of all vertices, queried only once per graph
+            compressed_labels = np.asarray(graph.vs['compressed_label'])
 
             if self._use_infinity_norm:
                 x_infinity_norm = \
@@ -296,7 +341,7 @@ class PersistenceFeaturesGenerator:
                 x_label_persistence = np.zeros(num_labels)
 
                 for x, y, c in persistence_diagram:
-                    label = graph.vs[c]['compressed_label']
+                    label = compressed_labels[c]
                     persistence = abs(x - y)**self._p
                     x_label_persistence[label] += persistence
 
@@ -310,7 +355,7 @@ class PersistenceFeaturesGenerator:
                 x_original_features = np.zeros(num_labels)
 
                 for _, _, c in persistence_diagram:
-                    label = graph.vs[c]['compressed_label']
+                    label = compressed_labels[c]
                     x_original_features[label] += 1
 
             # Cycle persistence: use the edge information, i.e. the
@@ -326,20 +371,23 @@ class PersistenceFeaturesGenerator:
                 # wrong with our understanding of cycles.
                 assert num_cycles == len(edge_indices_cycles)
 
-                x_cycle_persistence = np.zeros(num_labels)
-                total_cycle_persistence = 0.0
+                # Every cycle edge contributes its weight to the labels
+                # of both of its endpoints. The endpoints are processed
+                # edge by edge, i.e. source before target, in order to
+                # keep the summation order of floating-point weights.
+                edges = np.array(graph.get_edgelist(), dtype=np.int64)
+                edges = edges.reshape(-1, 2)[edge_indices_cycles]
 
-                for edge_index in edge_indices_cycles:
-                    edge = graph.es[edge_index]
-                    weight = edge['weight']
+                weights = np.asarray(graph.es['weight'], dtype=np.float64)
+                weights = weights[edge_indices_cycles]**self._p
 
-                    total_cycle_persistence += weight**self._p
-
-                    source_label = graph.vs[edge.source]['compressed_label']
-                    target_label = graph.vs[edge.target]['compressed_label']
+                x_cycle_persistence = np.zeros(num_labels)
 
-                    x_cycle_persistence[source_label] += weight**self._p
-                    x_cycle_persistence[target_label] += weight**self._p
+                np.add.at(
+                    x_cycle_persistence,
+                    compressed_labels[edges.ravel()],
+                    np.repeat(weights, 2)
+                )
 
             X[index, :] = np.concatenate((x_infinity_norm,
                                           x_total_persistence,
@@ -481,6 +529,9 @@ class WeisfeilerLehmanSubtree:
     the original paper on graph kernels by Shervashidze et al.; one may
     also rephrase this in terms of a graph with _uniform_ weights. Yet,
     in the interest of readability, we provide a separate class.
+
+    Since most subtree patterns only occur in a few graphs, the feature
+    matrix is returned as a sparse matrix.
     '''
 
     def __init__(self):
@@ -496,11 +547,12 @@ class WeisfeilerLehmanSubtree:
         X_per_iteration = []
         num_columns_per_iteration = {}
 
-        for iteration in sorted(label_dicts.keys()):
+        # Make the feature vector assignment easier for each of the
+        # 'subtree graphs'. It is sufficient to copy the graphs *once*
+        # because their labels are overwritten in every iteration.
+        wl_graphs = [graph.copy() for graph in graphs]
 
-            # Make the feature vector assignment easier for each of the
-            # 'subtree graphs'.
-            wl_graphs = [graph.copy() for graph in graphs]
+        for iteration in sorted(label_dicts.keys()):
 
             for graph_index in sorted(label_dicts[iteration].keys()):
                 labels_raw, labels_compressed = \
@@ -518,13 +570,15 @@ class WeisfeilerLehmanSubtree:
                 num_columns_per_iteration[iteration] = \
                     X_per_iteration[-1].shape[1]
 
-        return np.concatenate(X_per_iteration, axis=1), \
+        return scipy.sparse.hstack(X_per_iteration, format='csr'), \
             num_columns_per_iteration
 
     def get_subtree_feature_vectors(self, graphs):
         '''
         Calculates the feature vectors of a sequence of graphs. The
         `label` attribute is used to calculate features.
+
+        :return: Sparse matrix (in CSR format) of label counts
         '''
 
         num_labels = 0
@@ -545,17 +599,21 @@ class WeisfeilerLehmanSubtree:
         num_rows = len(graphs)
         num_columns = num_labels
 
-        X = np.zeros((num_rows, num_columns))
+        # Features, i.e. label counts, for all graphs. Most labels only
+        # occur in a few graphs, so the matrix is stored sparsely; the
+        # duplicate entries of each (graph, label) pair are summed upon
+        # conversion.
+        rows = []
+        columns = []
 
         for index, graph in enumerate(graphs):
+            rows.extend([index] * graph.vcount())
+            columns.extend(graph.vs['label'])
 
-            # Features, i.e. label counts, for the current graph
-            x = np.zeros(num_columns)
-
-            for label in graph.vs['label']:
-                x[label] += 1
-
-            X[index, :] = x
+        X = scipy.sparse.csr_matrix(
+            (np.ones(len(rows)), (rows, columns)),
+            shape=(num_rows, num_columns)
+        )
 
         return X
 
@@ -581,14 +639,12 @@ class WeisfeilerLehmanAttributePropagation:
 
         for iteration in range(1, num_iterations + 1):
             for index, graph in enumerate(graphs):
-                attributes_per_vertex = np.array(graph.vs[attribute])
-
-                for edge in graph.es:
-                    source = edge.source
-                    target = edge.target
+                vertex_attributes = graph.vs[attribute]
+                attributes_per_vertex = np.array(vertex_attributes)
 
-                    source_attribute = graph.vs[attribute][source]
-                    target_attribute = graph.vs[attribute][target]
+                for source, target in graph.get_edgelist():
+                    source_attribute = vertex_attributes[source]
+                    target_attribute = vertex_attributes[target]
 
                     # Switch the calculation here: the *source* vertex
                     # contributes once to the *target* attribute while
@@ -615,13 +671,24 @@ class WeisfeilerLehmanAttributePropagation:
         return attributes
 
 
-class FeatureSelector(TransformerMixin):
-    def __init__(self, num_columns_per_iteration):
-        self._num_columns_per_iteration = num_columns_per_iteration
+class FeatureSelector(BaseEstimator, TransformerMixin):
+    '''
+    Selects the columns of a feature matrix that belong to the first
+    iterations of the Weisfeiler--Lehman procedure. This class follows
+    the `scikit-learn` estimator interface so that it can be cloned and
+    cached as part of a pipeline.
+    '''
+
+    def __init__(self, num_columns_per_iteration, num_iterations=None):
+        '''
+        :param num_columns_per_iteration: Number of feature columns
+        generated by each iteration
+        :param num_iterations: Last iteration whose columns are being
+        selected. If not specified, all columns will be selected.
+        '''
 
-    def set_params(self, **params):
-        for key, value in params.items():
-            setattr(self, key, value)
+        self.num_columns_per_iteration = num_columns_per_iteration
+        self.num_iterations = num_iterations
 
     def fit(self, X, y=None, **params):
         return self
@@ -631,11 +698,15 @@ class FeatureSelector(TransformerMixin):
 
     def fit_transform(self, X, y=None, **params):
 
-        # Determine the number of columns to select for the desired
-        # number of iterations.
+        if self.num_iterations is None:
+            return X
 
-        last_column = 0
-        for iteration in range(0, self.num_iterations + 1):
-            last_column += self._num_columns_per_iteration[iteration]
+        # Determine the number of columns to select for the desired
+        # number of iterations. Slicing returns a view for dense input
+        # and works for sparse input, so no copy is being made here.
+        last_column = sum(
+            self.num_columns_per_iteration[iteration]
+            for iteration in range(self.num_iterations + 1)
+        )
 
         return X[:, :last_column]
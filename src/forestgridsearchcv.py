@@ -0,0 +1,117 @@
+'''
+Contains a grid search for pipelines whose final step is a tree
+ensemble, which grows the ensemble instead of fitting it repeatedly.
+'''
+
+import joblib
+
+import numpy as np
+
+from sklearn.base import BaseEstimator
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import ParameterGrid
+from sklearn.model_selection import StratifiedKFold
+
+
+def _fit_and_score_forests(pipeline, parameters, n_estimators_param,
+                           n_estimators, X, y, train, test):
+    '''
+    Fits the pre-processing steps of a pipeline once and grows its final
+    ensemble incrementally, evaluating it for every number of trees.
+
+    :return: Accuracy scores, one for each entry of `n_estimators`
+    '''
+
+    pipeline = clone(pipeline).set_params(**parameters)
+
+    X_train, X_test = X[train], X[test]
+    y_train, y_test = y[train], y[test]
+
+    for _, step in pipeline.steps[:-1]:
+        X_train = step.fit_transform(X_train, y_train)
+        X_test = step.transform(X_test)
+
+    forest = pipeline.steps[-1][1]
+    forest.set_params(warm_start=True)
+
+    scores = []
+    # The name of the parameter is prefixed with the name of the step
+    name = n_estimators_param.split('__')[-1]
+
+    for n in n_estimators:
+        forest.set_params(**{name: n})
+        forest.fit(X_train, y_train)
+
+        scores.append(accuracy_score(y_test, forest.predict(X_test)))
+
+    return scores
+
+
+class ForestGridSearchCV(BaseEstimator):
+    '''
+    A grid search for pipelines whose final step is a random forest. In
+    contrast to `GridSearchCV`, forests with different numbers of trees
+    are not fitted from scratch. Instead, a single forest is grown using
+    `warm_start`; for a fixed random state, this results in exactly the
+    same forests, but only requires fitting the largest one.
+
+    The same applies to gradient boosting without early stopping, whose
+    number of iterations can be specified via `n_estimators_param`.
+
+    The class follows the interface of `GridSearchCV`, i.e. it provides
+    the `best_params_`, `best_score_`, and `best_estimator_` attributes
+    after fitting.
+    '''
+
+    def __init__(self, estimator, param_grid, cv=5,
+                 n_estimators_param='clf__n_estimators', n_jobs=None):
+        self.estimator = estimator
+        self.param_grid = param_grid
+        self.cv = cv
+        self.n_estimators_param = n_estimators_param
+        self.n_jobs = n_jobs
+
+    def fit(self, X, y):
+        if isinstance(self.cv, int):
+            cv = StratifiedKFold(n_splits=self.cv, shuffle=True)
+        else:
+            cv = self.cv
+
+        param_grid = dict(self.param_grid)
+        n_estimators = sorted(param_grid.pop(self.n_estimators_param))
+
+        grid = ParameterGrid(param_grid)
+        splits = list(cv.split(X, y))
+
+        scores = joblib.Parallel(n_jobs=self.n_jobs)(
+            joblib.delayed(_fit_and_score_forests)(
+                self.estimator, parameters, self.n_estimators_param,
+                n_estimators, X, y, train, test
+            )
+            for parameters in grid
+            for train, test in splits
+        )
+
+        # Average over all splits; the resulting scores are indexed by
+        # the number of trees and the remaining parameters, such that
+        # ties are broken in favour of smaller forests.
+        scores = np.array(scores).reshape(
+            len(grid), len(splits), len(n_estimators)
+        ).mean(axis=1).T
+
+        n_index, param_index = np.unravel_index(np.argmax(scores), scores.shape)
+
+        self.best_params_ = dict(grid[param_index])
+        self.best_params_[self.n_estimators_param] = n_estimators[n_index]
+        self.best_score_ = scores[n_index, param_index]
+
+        self.best_estimator_ = clone(self.estimator).set_params(
+            **self.best_params_
+        )
+        self.best_estimator_.fit(X, y)
+
+        return self
+
+    def predict(self, X):
+        return self.best_estimator_.predict(X)
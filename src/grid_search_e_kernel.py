@@ -4,7 +4,6 @@
 # kernels.
 
 import copy
-import igraph as ig
 import numpy as np
 import pandas as pd
 
@@ -33,11 +32,12 @@ from features import FeatureSelector
 from features import PersistentWeisfeilerLehman
 from features import WeisfeilerLehmanSubtree
 
+from utilities import read_graphs
 from utilities import read_labels
 
 def main(args, logger):
 
-    graphs = [ig.read(filename) for filename in args.FILES]
+    graphs = read_graphs(args.FILES)
     labels = read_labels(args.labels)
     
     # Set the label to be uniform over all graphs in case no labels are
@@ -24,23 +24,29 @@ class KernelGridSearchCV:
         if self._cv is None:
             cv = KFold(n_splits=3, shuffle=True, random_state=self._random_state)
         elif isinstance(self._cv, int):
-            cv = StratifiedKFold(n_splits=self._cv, shuffle=True, random_state=self.random_state)
+            cv = StratifiedKFold(n_splits=self._cv, shuffle=True, random_state=self._random_state)
         else:
             cv = self._cv
 
         grid = ParameterGrid(self._grid)
 
+        # The sub-matrices of the kernel matrix do not depend on the
+        # parameters, so they are extracted only once for every split.
+        folds = []
+        for train, test in cv.split(np.zeros(len(y)), y):
+            folds.append((
+                X[np.ix_(train, train)],
+                y[train],
+                X[np.ix_(test, train)],
+                y[test]
+            ))
+
         for parameters in grid:
             clf = self._clf
             clf.set_params(**parameters)
 
             scores = []
-            for train, test in cv.split(np.zeros(len(y)), y):
-                X_train = X[train][:, train]
-                y_train = y[train]
-                X_test = X[test][:, train]
-                y_test = y[test]
-
+            for X_train, y_train, X_test, y_test in folds:
                 clf.fit(X_train, y_train)
 
                 ap = accuracy_score(y_test, clf.predict(X_test))
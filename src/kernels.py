@@ -7,7 +7,95 @@ import math
 import numpy as np
 
 
-from sklearn.metrics import pairwise_distances
+from numba import njit
+from numba import prange
+
+
+@njit(cache=True, fastmath=True)
+def _kernel(F, G, c):
+    '''
+    Calculates the unnormalized persistence scale-space kernel between
+    two persistence diagrams. Every point of the second diagram is also
+    mirrored along the diagonal; the mirrored points contribute with
+    a negative weight.
+
+    :param F: First persistence diagram, stored as an array of shape
+    (2, n) that contains creation values in the first row and
+    destruction values in the second row
+    :param G: Second persistence diagram, stored like the first one
+    :param c: Scale parameter, i.e. eight times the smoothing parameter
+
+    :return: Kernel value
+    '''
+
+    k = 0.0
+    for i in range(F.shape[1]):
+
+        # Calculations are performed in double precision, regardless of
+        # the precision of the diagrams.
+        x = np.float64(F[0, i])
+        y = np.float64(F[1, i])
+
+        for j in range(G.shape[1]):
+            dx = x - G[0, j]
+            dy = y - G[1, j]
+
+            # Distances to the mirrored point
+            mx = x - G[1, j]
+            my = y - G[0, j]
+
+            k += math.exp(-(dx * dx + dy * dy) / c)
+            k -= math.exp(-(mx * mx + my * my) / c)
+
+    return k
+
+
+@njit(cache=True, parallel=True)
+def _pairwise_kernel(points, offsets, c, block_size=64):
+    '''
+    Calculates the unnormalized persistence scale-space kernel matrix of
+    a set of persistence diagrams, which are stored consecutively in an
+    array of points.
+
+    :param points: Points of all persistence diagrams, stored as an
+    array of shape (2, n)
+    :param offsets: Index of the first point of every diagram, followed
+    by the total number of points
+    :param c: Scale parameter, i.e. eight times the smoothing parameter
+    :param block_size: Number of rows and columns of the blocks that
+    are evaluated by a single thread
+
+    :return: Kernel matrix
+    '''
+
+    n = len(offsets) - 1
+
+    # Every entry is accumulated in double precision, but single
+    # precision is sufficient for storing the matrix itself.
+    K = np.zeros((n, n), dtype=np.float32)
+
+    # The kernel is symmetric, so only the blocks in the upper triangle
+    # need to be evaluated. In contrast to distributing rows, whose
+    # lengths differ, blocks result in an even workload for all threads
+    # and re-use the same diagrams for a whole block.
+    n_blocks = (n + block_size - 1) // block_size
+
+    blocks = []
+    for a in range(n_blocks):
+        for b in range(a, n_blocks):
+            blocks.append((a * block_size, b * block_size))
+
+    for index in prange(len(blocks)):
+        i0, j0 = blocks[index]
+
+        for i in range(i0, min(i0 + block_size, n)):
+            F = points[:, offsets[i]:offsets[i + 1]]
+
+            for j in range(max(i, j0), min(j0 + block_size, n)):
+                K[i, j] = _kernel(F, points[:, offsets[j]:offsets[j + 1]], c)
+                K[j, i] = K[i, j]
+
+    return K
 
 
 class PersistenceScaleSpaceKernel:
@@ -22,18 +110,58 @@ class PersistenceScaleSpaceKernel:
         return np.matmul(D, np.array([[0.0, 1.0], [1.0, 0.0]]))
 
     def fit_transform(self, F, G):
-        G_m = self.mirror_along_diagonal(G)
+        c = 8 * self._sigma
+
+        F = np.ascontiguousarray(np.asarray(F, dtype=np.float64).T)
+        G = np.ascontiguousarray(np.asarray(G, dtype=np.float64).T)
+
+        return _kernel(F, G, c) / (c * math.pi)
+
+    def pairwise(self, points, offsets):
+        '''
+        Calculates the kernel matrix between all pairs of persistence
+        diagrams. The diagrams are stored consecutively in an array of
+        points, such that the points of the ith diagram are given by
+        `points[:, offsets[i]:offsets[i + 1]]`.
+
+        :param points: Array of shape (2, n), containing the creation
+        values in the first row and the destruction values in the
+        second row
+        :param offsets: Index of the first point of every diagram,
+        followed by the total number of points
+
+        :return: Kernel matrix in single precision
+        '''
 
-        X = F
-        Y = np.concatenate([G, G_m], 0)
         c = 8 * self._sigma
 
-        distances = np.exp(-pairwise_distances(X, Y, metric='sqeuclidean') / c)
+        # Identical diagrams, which are frequent in early iterations,
+        # only have to be evaluated once. Each diagram is mapped to the
+        # index of its first occurrence among the unique diagrams.
+        unique_diagrams = {}
+        index = np.empty(len(offsets) - 1, dtype=np.int64)
+
+        for i in range(len(offsets) - 1):
+            key = points[:, offsets[i]:offsets[i + 1]].tobytes()
+            index[i] = unique_diagrams.setdefault(key, len(unique_diagrams))
+
+        if len(unique_diagrams) < len(index):
+            _, first = np.unique(index, return_index=True)
+            sizes = np.diff(offsets)[first]
+
+            unique_offsets = np.zeros(len(first) + 1, dtype=np.int64)
+            unique_offsets[1:] = np.cumsum(sizes)
 
-        # Negative weights for the 'negative' part of the mirrored
-        # persistence points in the other diagram.
-        weights = np.ones((len(X), len(Y)))
-        weights[:, len(G):] = -1
+            unique_points = np.ascontiguousarray(
+                np.concatenate(
+                    [points[:, offsets[i]:offsets[i + 1]] for i in first],
+                    axis=1
+                )
+            )
 
-        return np.sum(np.multiply(weights, distances)) / (c * math.pi)
+            K = _pairwise_kernel(unique_points, unique_offsets, c)
+            K = K[np.ix_(index, index)]
+        else:
+            K = _pairwise_kernel(points, offsets, c)
 
+        return K / (c * math.pi)
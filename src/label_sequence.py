@@ -4,7 +4,6 @@
 # sequence and uses it to assign distances between the vertices. As
 # a result, a distance matrix will be stored.
 
-import igraph as ig
 import numpy as np
 
 import argparse
@@ -17,6 +16,7 @@ from sklearn.model_selection import StratifiedKFold
 from features import PersistenceFeaturesGenerator
 from features import WeisfeilerLehman
 
+from utilities import read_graphs
 from utilities import read_labels
 
 
@@ -28,7 +28,7 @@ if __name__ == '__main__':
     parser.add_argument('-n', '--num-iterations', default=3, type=int, help='Number of Weisfeiler-Lehman iterations')
 
     args = parser.parse_args()
-    graphs = [ig.read(filename) for filename in args.FILES]
+    graphs = read_graphs(args.FILES)
     y = np.array(read_labels(args.labels))
 
     wl = WeisfeilerLehman()
@@ -71,8 +71,13 @@ if __name__ == '__main__':
         weighted_graph = graph.copy()
         weighted_graph.vs['compressed_label'] = labels_compressed
 
-        for e in weighted_graph.es:
-            e['weight'] = distances[e.tuple]
+        # Query the endpoints of all edges at once instead of creating
+        # an edge object for each of them.
+        edges = np.array(weighted_graph.get_edgelist(), dtype=np.int64)
+        edges = edges.reshape(-1, 2)
+
+        weighted_graph.es['weight'] = \
+            distances[edges[:, 0], edges[:, 1]].tolist()
 
         weighted_graphs.append(weighted_graph)
 
@@ -4,209 +4,135 @@
 # kernels.
 
 
-import igraph as ig
 import numpy as np
+import scipy.sparse
 
 import argparse
-import collections
-import logging
+import functools
 
-
-from sklearn.linear_model import LogisticRegression
+# Required for `scikit-learn` versions prior to 1.0
+from sklearn.experimental import enable_hist_gradient_boosting  # noqa
+from sklearn.ensemble import HistGradientBoostingClassifier
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import accuracy_score
 from sklearn.model_selection import StratifiedKFold
-from sklearn.model_selection import GridSearchCV
 from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import LabelEncoder
-from sklearn.preprocessing import MinMaxScaler
-from sklearn.preprocessing import StandardScaler
-from sklearn.svm import SVC
 
-from tqdm import tqdm
+from forestgridsearchcv import ForestGridSearchCV
 
 from features import FeatureSelector
-from features import PersistentWeisfeilerLehman
-from features import WeisfeilerLehmanSubtree
 
-from utilities import read_labels
+from _cv_driver import add_common_arguments
+from _cv_driver import calculate_features
+from _cv_driver import read_data
+from _cv_driver import resume_directory
+from _cv_driver import run_cv
+from _cv_driver import setup_logger
+
+
+def fit_and_predict(X, y, num_columns_per_iteration, args, train_index,
+                    test_index, random_state):
+    # Histogram-based gradient boosting bins all features, which makes
+    # fitting it much faster than fitting a random forest. Early stopping
+    # is disabled so that the number of iterations can be grown like the
+    # number of trees of a forest.
+    if args.boosting:
+        estimator = HistGradientBoostingClassifier(
+            max_iter=50,
+            early_stopping=False,
+            random_state=42
+        )
 
+        n_estimators_param = 'clf__max_iter'
+    else:
+        estimator = RandomForestClassifier(
+            n_estimators=50,
+            class_weight='balanced' if args.balanced else None,
+            random_state=42
+        )
 
-def main(args, logger):
+        n_estimators_param = 'clf__n_estimators'
 
-    # Read all graphs and labels; there is no direct way of checking
-    # that the labels are 'correct' for the graphs, but at least the
-    # code will check that they have the same cardinality.
-    graphs = [ig.read(filename) for filename in args.FILES]
-    labels = read_labels(args.labels)
-
-    # Simple pre-processing to ensure that all graphs are set up
-    # equally.
-    #
-    # TODO: make this into a shared function?
-    for graph in graphs:
-        # Set the label to be uniform over all graphs in case no labels are
-        # available. This essentially changes our iteration to degree-based
-        # checks.
-        if 'label' not in graph.vs.attributes():
-            graph.vs['label'] = [0] * len(graph.vs)
-
-        # Reset edge weights if they already exist
-        if 'weight' in graph.es.attributes():
-            graph.es['weight'] = [0] * len(graph.es)
-
-    logger.info(
-        'Read {} graphs and {} labels'.format(len(graphs), len(labels))
-    )
+    if args.grid_search:
+        pipeline = Pipeline(
+            [
+                ('fs', FeatureSelector(num_columns_per_iteration)),
+                ('clf', estimator)
+            ],
+        )
+
+        grid_params = {
+            'fs__num_iterations':
+                np.arange(0, args.num_iterations + 1),
+
+            n_estimators_param:
+                [10, 20, 50, 100, 150, 200],
+        }
+
+        # Grows the forests incrementally instead of fitting
+        # one of them for every number of trees.
+        clf = ForestGridSearchCV(
+                pipeline,
+                grid_params,
+                cv=StratifiedKFold(
+                    n_splits=10, shuffle=True, random_state=random_state
+                ),
+                n_estimators_param=n_estimators_param,
+                n_jobs=4)
+    else:
+        clf = estimator
+
+    X_train, X_test = X[train_index], X[test_index]
+    y_train = y[train_index]
+
+    # Tree ensembles are invariant under monotone feature transformations,
+    # so the features are not scaled.
+
+    clf.fit(X_train, y_train)
 
-    assert len(graphs) == len(labels)
+    if args.grid_search:
+        return clf.predict(X_test), clf.best_params_
+    else:
+        return clf.predict(X_test), clf.get_params()
+
+
+def main(args, logger):
+
+    graphs, y = read_data(args, logger)
 
     # Replace selected metric if necessary; this only applies to the
     # uniform metric shortcut.
     if args.use_uniform_metric:
         args.metric = 'uniform'
 
-    pwl = PersistentWeisfeilerLehman(
-            use_cycle_persistence=args.use_cycle_persistence,
-            use_original_features=args.use_original_features,
-            use_label_persistence=True,
-            metric=args.metric,
-            p=args.power,
-            smooth=args.smooth
-    )
-
     if args.use_cycle_persistence:
         logger.info('Using cycle persistence')
 
-    # Ensures that labels are encoded correctly, regardless of whether
-    # they are numerical or not.
-    y = LabelEncoder().fit_transform(labels)
-
-    # This ignores *all* other feature generation methods and falls back
-    # to the original Weisfeiler--Lehman subtree kernel.
-    if args.use_subtree_features:
-
-        logger.info('Using original subtree features')
-
-        wl_subtree = WeisfeilerLehmanSubtree()
-        X, num_columns_per_iteration = \
-            wl_subtree.transform(graphs, args.num_iterations)
-    else:
-        X, num_columns_per_iteration = \
-            pwl.transform(graphs, args.num_iterations)
-
-    logger.info('Finished persistent Weisfeiler-Lehman transformation')
-    logger.info(
-        'Obtained ({} x {}) feature matrix'.format(X.shape[0], X.shape[1])
+    X, num_columns_per_iteration = calculate_features(
+        graphs, args, logger, p=args.power, smooth=args.smooth
     )
 
+    # Gradient boosting does not support sparse feature matrices
+    if args.boosting and scipy.sparse.issparse(X):
+        X = X.toarray()
+
+    # The splits of all repetitions are drawn from the global random
+    # number generator, just like they always have been for this script.
     np.random.seed(42)
-    cv = StratifiedKFold(n_splits=10, shuffle=True)
-    mean_accuracies = []
-
-    for i in range(10):
-
-        # Contains accuracy scores for each cross validation step; the
-        # means of this list will be used later on.
-        accuracy_scores = []
-
-        for train_index, test_index in cv.split(X, y):
-            rf_clf = RandomForestClassifier(
-                n_estimators=50,
-                class_weight='balanced' if args.balanced else None,
-                random_state=42
-            )
-
-            if args.grid_search:
-                pipeline = Pipeline(
-                    [
-                        ('fs', FeatureSelector(num_columns_per_iteration)),
-                        ('clf', rf_clf)
-                    ],
-                )
-
-                grid_params = {
-                    'fs__num_iterations':
-                        np.arange(0, args.num_iterations + 1),
-
-                    'clf__n_estimators':
-                        [10, 20, 50, 100, 150, 200],
-                }
-
-                clf = GridSearchCV(
-                        pipeline,
-                        grid_params,
-                        cv=StratifiedKFold(n_splits=10, shuffle=True),
-                        iid=False,
-                        scoring='accuracy',
-                        n_jobs=4)
-            else:
-                clf = rf_clf
-
-            X_train, X_test = X[train_index], X[test_index]
-            y_train, y_test = y[train_index], y[test_index]
-
-            scaler = StandardScaler()
-            X_train = scaler.fit_transform(X_train)
-            X_test = scaler.transform(X_test)
-
-            scaler = MinMaxScaler()
-            X_train = scaler.fit_transform(X_train)
-            X_test = scaler.transform(X_test)
-
-            clf.fit(X_train, y_train)
-            y_pred = clf.predict(X_test)
-
-            accuracy_scores.append(accuracy_score(y_test, y_pred))
-
-            logger.debug('Best classifier for this fold: {}'.format(clf))
-
-            if args.grid_search:
-                logger.debug(
-                    'Best parameters for this fold: {}'.format(
-                        clf.best_params_)
-                    )
-            else:
-                logger.debug(
-                    'Best parameters for this fold: {}'.format(
-                        clf.get_params())
-                )
-
-        mean_accuracies.append(np.mean(accuracy_scores))
-        logger.info(
-            '''  - Mean 10-fold accuracy: {:2.2f} [running mean over all
-            folds: {:2.2f}]'''.format(
-                mean_accuracies[-1] * 100, np.mean(mean_accuracies) * 100)
-        )
 
-    logger.info(
-        'Accuracy: {:2.2f} +- {:2.2f}'.format(
-            np.mean(mean_accuracies) * 100, np.std(mean_accuracies) * 100)
+    run_cv(
+        functools.partial(
+            fit_and_predict, X, y, num_columns_per_iteration, args
+        ),
+        y,
+        logger,
+        resume_dir=resume_directory(args),
+        seed_repetitions=False
     )
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
-    parser.add_argument(
-        'FILES', nargs='+', help='Input graphs (in some supported format)'
-    )
-
-    # Controls behaviour of the classifier (will be treated as
-    # a hyperparameter in the respective grid search scripts)
-    parser.add_argument(
-        '-b', '--balanced',
-        action='store_true', help='Make random forest classifier balanced'
-    )
-
-    parser.add_argument('-d', '--dataset', help='Name of data set')
-    parser.add_argument(
-        '-l', '--labels', type=str, help='Labels file', required=True
-    )
-
-    parser.add_argument(
-        '-n', '--num-iterations', default=3,
-        type=int, help='Number of Weisfeiler-Lehman iterations'
-    )
+    add_common_arguments(parser)
 
     parser.add_argument(
         '-g', '--grid-search', action='store_true',
@@ -214,18 +140,14 @@ if __name__ == '__main__':
     )
 
     parser.add_argument(
-        '-c', '--use-cycle-persistence', action='store_true', default=False,
-        help='Indicates whether cycle persistence should be calculated or not'
-    )
-
-    parser.add_argument(
-        '-o', '--use-original-features', action='store_true', default=False,
-        help='Indicates that original features should be used as well'
+        '-B', '--boosting', action='store_true', default=False,
+        help='Use gradient boosting instead of a random forest classifier'
     )
 
-    # TODO: this flag is somewhat redundant given the flag above; need
-    # to ensure that it is seen as an 'override', i.e. if this is set,
-    # *no* other ways of calculating features can be used.
+    # TODO: this flag is somewhat redundant given the flag for using
+    # the original features; need to ensure that it is seen as an
+    # 'override', i.e. if this is set, *no* other ways of calculating
+    # features can be used.
     parser.add_argument(
         '-s', '--use-subtree-features', action='store_true', default=False,
         help='''
@@ -243,12 +165,6 @@ if __name__ == '__main__':
     # Metric selection options
     ####################################################################
 
-    parser.add_argument(
-        '-m', '--metric',
-        type=str, default='minkowski',
-        help='Metric to use for graph weight assignment'
-    )
-
     parser.add_argument(
         '-u', '--use-uniform-metric',
         action='store_true', default=False,
@@ -263,22 +179,8 @@ if __name__ == '__main__':
 
     args = parser.parse_args()
 
-    logging.basicConfig(
-        level=logging.DEBUG,
-        filename='{}_{:02d}.log'.format(args.dataset, args.num_iterations)
-    )
-
-    logger = logging.getLogger('P-WL')
-
-    # Create a second stream handler for logging to `stderr`, but set
-    # its log level to be a little bit smaller such that we only have
-    # informative messages
-    stream_handler = logging.StreamHandler()
-    stream_handler.setLevel(logging.INFO)
-
-    # Use the default format; since we do not adjust the logger before,
-    # this is all right.
-    stream_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
-    logger.addHandler(stream_handler)
+    if args.balanced and args.boosting:
+        parser.error('Balanced classes require a random forest classifier')
+    logger = setup_logger(args)
 
     main(args, logger)
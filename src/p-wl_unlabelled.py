@@ -4,14 +4,11 @@
 # features for graphs that have no attributes and no (node|edge) labels.
 
 
-import igraph as ig
 import numpy as np
 
 import argparse
 import collections
 import logging
-import itertools
-import joblib
 import os
 
 from sklearn.metrics import accuracy_score
@@ -23,6 +20,7 @@ from features import WeisfeilerLehmanAttributePropagation
 
 from kernels import PersistenceScaleSpaceKernel
 
+from utilities import read_graphs
 from utilities import read_labels
 
 from topology import assign_filtration_values
@@ -31,7 +29,7 @@ from topology import PersistenceDiagramCalculator
 
 def main(args, logger):
 
-    graphs = [ig.read(filename) for filename in args.FILES]
+    graphs = read_graphs(args.FILES)
     labels = read_labels(args.labels)
 
     for graph in graphs:
@@ -58,7 +56,6 @@ def main(args, logger):
 
     # TODO: make configurable
     use_vertex_weights = False
-    parallel = 'joblib'
 
     if use_vertex_weights:
         pdc = PersistenceDiagramCalculator(vertex_attribute='degree')
@@ -66,34 +63,44 @@ def main(args, logger):
         pdc = PersistenceDiagramCalculator()
 
     # Stores *all* persistence diagrams because they will be used to
-    # represent the data set later on.
-    persistence_diagrams_per_iteration = collections.defaultdict(list)
+    # represent the data set later on. The points of all diagrams of an
+    # iteration are stored consecutively, together with the size of
+    # each diagram.
+    persistence_points_per_iteration = collections.defaultdict(list)
+    persistence_sizes_per_iteration = collections.defaultdict(list)
 
     for iteration in sorted(attributes_per_iteration.keys()):
         for index, graph in enumerate(graphs):
             attributes = attributes_per_iteration[iteration][index]
 
-            # TODO: this is only used if `use_vertex_weights` is True,
-            # but right now, this flag cannot be configured anyway.
-            graph.vs['degree'] = attributes / np.max(attributes)
+            # Vertex weights are only read by the persistence diagram
+            # calculator if `use_vertex_weights` is True, but right now,
+            # this flag cannot be configured anyway.
+            if use_vertex_weights:
+                graph.vs['degree'] = attributes / np.max(attributes)
 
-            weighted_graph = assign_filtration_values(
+            # Assigns the edge weights in place; they are used by the
+            # persistence diagram calculator.
+            assign_filtration_values(
                 graph,
                 attributes,
                 normalize=args.normalize
             )
 
-            pd, edge_indices_cycles = pdc.fit_transform(graph)
-
-            # Store the persistence diagram as a 2D array in order to
-            # facilitate the subsequent kernel calculations.
-            persistence_diagrams_per_iteration[iteration].append(
-                np.array([(c, d) for c, d, _ in pd])
+        # The diagrams of all graphs are calculated in parallel once all
+        # filtrations of the iteration have been assigned.
+        for pd, edge_indices_cycles in pdc.fit_transform_many(graphs):
+            persistence_points_per_iteration[iteration].extend(
+                (c, d) for c, d, _ in pd
             )
 
+            persistence_sizes_per_iteration[iteration].append(len(pd))
+
     # Will contain the full kernel matrix over all iterations; it is
     # composed of sums of kernel matrices for individual iterations.
-    K = np.zeros((len(graphs), len(graphs)))
+    # Like these matrices, it is stored in single precision; `SVC` will
+    # only convert the sub-matrices of individual folds.
+    K = np.zeros((len(graphs), len(graphs)), dtype=np.float32)
 
     # Use this as the kernel for evaluating individual persistence
     # diagrams
@@ -107,44 +114,28 @@ def main(args, logger):
 
     # Prepare kernel matrix _per iteration_; since this is a kernel, we
     # can just sum over individual iterations
-    for iteration in sorted(persistence_diagrams_per_iteration.keys()):
-        persistence_diagrams = persistence_diagrams_per_iteration[iteration]
-        n = len(persistence_diagrams)
-        K_iteration = np.zeros((n, n))
-
-        # Auxiliary function for calculating the kernel between two
-        # persistence diagrams.
-        def kernel(i, j):
-            return pss.fit_transform(
-                persistence_diagrams[i],
-                persistence_diagrams[j]
-            )
+    for iteration in sorted(persistence_points_per_iteration.keys()):
+
+        # Store the persistence diagrams of the iteration as a single
+        # array with one row for creation values and one row for
+        # destruction values; single precision is sufficient for the
+        # kernel calculations, which are performed in double precision.
+        points = np.ascontiguousarray(
+            np.array(
+                persistence_points_per_iteration[iteration],
+                dtype=np.float32
+            ).T
+        )
 
-        # We need to use `combinations_with_replacement` because the
-        # diagonal elements of the kernel are relevant as well. This
-        # is *not* a metric, after all.
-        if parallel == 'joblib':
-            evaluations = \
-                joblib.Parallel(
-                    n_jobs=256,
-                    require='sharedmem',
-                    verbose=100,
-                    batch_size=128)(
-                    joblib.delayed(kernel)(i, j)
-                        for i, j in itertools.combinations_with_replacement(range(n), 2)
-                    )
-
-            K_iteration[np.triu_indices(n)] = np.array(evaluations)
-            K_iteration[np.tril_indices(n)] = K_iteration.T[np.tril_indices(n)]
+        sizes = persistence_sizes_per_iteration[iteration]
 
-        else:
-            for i, j in itertools.combinations_with_replacement(range(n), 2):
-                K_iteration[i, j] = pss.fit_transform(
-                    persistence_diagrams[i],
-                    persistence_diagrams[j],
-                )
+        offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(sizes)
 
-                K_iteration[j, i] = K_iteration[i, j]
+        # Evaluates the kernel for all pairs of diagrams, including
+        # the diagonal elements, which are relevant as well. This is
+        # *not* a metric, after all.
+        K_iteration = pss.pairwise(points, offsets)
 
         K_per_iteration.append(K_iteration)
 
@@ -170,23 +161,28 @@ def main(args, logger):
     )
 
     y = LabelEncoder().fit_transform(labels)
-    cv = StratifiedKFold(
-            n_splits=10,
-            shuffle=True,
-    )
     mean_scores = []
 
-    np.random.seed(42)
-
     logging.info('Starting training...')
 
+    # The splits are drawn from the global random number generator at
+    # the beginning of every repetition. They cannot be generated up
+    # front because fitting an `SVC` draws from the same generator, and
+    # the splits of later repetitions would change.
+    cv = StratifiedKFold(n_splits=10, shuffle=True)
+
+    np.random.seed(42)
+
     for i in range(10):
         scores = []
         for train, test in cv.split(np.zeros(len(y)), y):
-            K_train = K[train][:, train]
+
+            # Extract the sub-matrices with a single indexing operation
+            # instead of creating an intermediate copy of all rows.
+            K_train = K[np.ix_(train, train)]
             y_train = y[train]
 
-            K_test = K[test][:, train]
+            K_test = K[np.ix_(test, train)]
             y_test = y[test]
 
             clf = SVC(kernel='precomputed', C=1)
@@ -7,7 +7,6 @@
 # This script will *not* perform any fitting.
 
 
-import igraph as ig
 import numpy as np
 
 import argparse
@@ -20,6 +19,7 @@ from features import WeisfeilerLehmanAttributePropagation
 
 from kernels import PersistenceScaleSpaceKernel
 
+from utilities import read_graphs
 from utilities import read_labels
 
 from topology import assign_filtration_values
@@ -28,7 +28,7 @@ from topology import PersistenceDiagramCalculator
 
 def main(args, logger):
 
-    graphs = [ig.read(filename) for filename in args.FILES]
+    graphs = read_graphs(args.FILES)
     labels = read_labels(args.labels)
 
     for graph in graphs:
@@ -60,7 +60,9 @@ def main(args, logger):
 
         # Determine maximum attribute value over *all* graphs and their
         # respective filtrations.
-        max_attribute = max([np.max(attributes_per_iteration[iteration][index]) for index, _ in enumerate(graphs)])
+        max_attribute = max(
+            np.max(attributes) for attributes in attributes_per_iteration[iteration]
+        )
 
         unpaired_value = 2 * max_attribute
 
@@ -77,15 +79,22 @@ def main(args, logger):
         for index, graph in enumerate(graphs):
             attributes = attributes_per_iteration[iteration][index]
 
-            graph.vs['degree'] = attributes
+            # Vertex weights are only read by the persistence diagram
+            # calculator if they have been requested.
+            if use_vertex_weights:
+                graph.vs['degree'] = attributes
 
-            weighted_graph = assign_filtration_values(
+            # Assigns the edge weights in place; they are used by the
+            # persistence diagram calculator.
+            assign_filtration_values(
                 graph,
                 attributes,
                 normalize=args.normalize
             )
 
-            pd, edge_indices_cycles = pdc.fit_transform(graph)
+        # The diagrams of all graphs are calculated in parallel once all
+        # filtrations of the iteration have been assigned.
+        for pd, edge_indices_cycles in pdc.fit_transform_many(graphs):
 
             # Store the persistence diagram as a 2D array in order to
             # facilitate the subsequent kernel calculations.
@@ -93,11 +102,15 @@ def main(args, logger):
                 np.array([(c, d) for c, d, _ in pd])
             )
 
-            np.savetxt(
-                '/tmp/{:04d}_d0_h{:d}.txt'.format(index, iteration),
-                np.array([(c, d) for c, d, _ in pd]),
-                fmt='%.f'
-            )
+        # Store all diagrams of the current iteration in a single binary
+        # file; the diagram of each graph is available under its index.
+        np.savez(
+            os.path.join(args.out_dir, 'd0_h{:d}.npz'.format(iteration)),
+            **{
+                '{:04d}'.format(index): diagram for index, diagram in
+                enumerate(persistence_diagrams_per_iteration[iteration])
+            }
+        )
 
 
 if __name__ == '__main__':
@@ -3,7 +3,6 @@
 # persistence_diagrams.py: creates persistence diagrams for Persistent
 # Weisfeiler--Lehman graph kernel features.
 
-import igraph as ig
 import numpy as np
 
 import matplotlib.pyplot as plt
@@ -31,6 +30,7 @@ from distances import kullback_leibler
 from features import FeatureSelector
 from features import PersistentWeisfeilerLehman
 
+from utilities import read_graphs
 from utilities import read_labels
 from utilities import to_probability_distribution
 
@@ -78,7 +78,7 @@ def make_kernel_matrices(persistence_diagrams, l, L):
 
 def main(args, logger):
 
-    graphs = [ig.read(filename) for filename in args.FILES]
+    graphs = read_graphs(args.FILES)
     labels = read_labels(args.labels)
 
     # Stores *all* vertex labels of the given graph in order to
@@ -5,27 +5,24 @@
 # measures such as the Kullback--Leibler divergence.
 
 
-import igraph as ig
 import numpy as np
 
 import argparse
 import collections
-import itertools
 import logging
 
 
 from sklearn.metrics import accuracy_score
 from sklearn.model_selection import StratifiedKFold
 from sklearn.preprocessing import LabelEncoder
-from sklearn.preprocessing import MinMaxScaler
-from sklearn.preprocessing import StandardScaler
 from sklearn.svm import SVC
 
-from distances import jensen_shannon
-from distances import kullback_leibler
+from distances import pairwise_jensen_shannon
+from distances import pairwise_kullback_leibler
 
 from features import PersistentWeisfeilerLehman
 
+from utilities import read_graphs
 from utilities import read_labels
 
 
@@ -36,15 +33,19 @@ def to_probability_distribution(X, num_columns_per_iteration):
     normalizing its sum accordingly.
     '''
 
-    start_index = 0
-    for iteration in sorted(num_columns_per_iteration.keys()):
-        end_index = num_columns_per_iteration[iteration]
+    num_columns = [
+        num_columns_per_iteration[iteration]
+        for iteration in sorted(num_columns_per_iteration.keys())
+    ]
 
-        row_sums = np.sum(X[:, start_index:end_index], axis=1)
+    # Calculate the row sums of all iterations at once and assign them
+    # to the columns of their iteration, such that a single division
+    # suffices.
+    X = np.ascontiguousarray(X)
+    start_indices = np.cumsum([0] + num_columns[:-1])
+    row_sums = np.add.reduceat(X, start_indices, axis=1)
 
-        X[:, start_index:end_index] /= row_sums[:, None]
-
-        start_index += end_index
+    X /= row_sums[:, np.repeat(np.arange(len(num_columns)), num_columns)]
 
     np.nan_to_num(X, copy=False)
     return X
@@ -52,7 +53,7 @@ def to_probability_distribution(X, num_columns_per_iteration):
 
 def main(args, logger):
 
-    graphs = [ig.read(filename) for filename in args.FILES]
+    graphs = read_graphs(args.FILES)
     labels = read_labels(args.labels)
 
     # Set the label to be uniform over all graphs in case no labels are
@@ -91,28 +92,27 @@ def main(args, logger):
         K = np.zeros((X.shape[0], Y.shape[0]))
 
         for iteration in sorted(num_columns_per_iteration.keys()):
-            end_index = num_columns_per_iteration[iteration]
+            end_index = start_index + num_columns_per_iteration[iteration]
 
             P = X[:, start_index:end_index]
             Q = Y[:, start_index:end_index]
 
-            # TODO: can this be made more efficient?
-            K_iteration = np.array(
-                [k(p, q) for p, q in itertools.product(P, Q)]).reshape(
-                X.shape[0], Y.shape[0]
-            )
-
-            K += K_iteration
+            K += k(P, Q)
 
-            start_index += end_index
+            start_index = end_index
 
         return K
 
     def jensen_shannon_kernel(X, Y):
-        return product_kernel(X, Y, jensen_shannon)
+        return product_kernel(X, Y, pairwise_jensen_shannon)
 
     def kullback_leibler_kernel(X, Y):
-        return -product_kernel(X, Y, kullback_leibler)
+        return -product_kernel(X, Y, pairwise_kullback_leibler)
+
+    # The kernel does not depend on the folds, so it is evaluated once
+    # for all graphs. The features are not scaled since this would
+    # destroy their normalization as probability distributions.
+    K = jensen_shannon_kernel(X, X)
 
     for i in range(3):
 
@@ -122,24 +122,15 @@ def main(args, logger):
 
         for train_index, test_index in cv.split(X, y):
             clf = SVC(
-                kernel=jensen_shannon_kernel,
+                kernel='precomputed',
             )
 
-            X_train, X_test = X[train_index], X[test_index]
+            K_train = K[np.ix_(train_index, train_index)]
+            K_test = K[np.ix_(test_index, train_index)]
             y_train, y_test = y[train_index], y[test_index]
 
-            # TODO: need to discuss whether this is 'allowed' or smart
-            # to do; this assumes normality of the attributes.
-            scaler = StandardScaler()
-            X_train = scaler.fit_transform(X_train)
-            X_test = scaler.transform(X_test)
-
-            scaler = MinMaxScaler()
-            X_train = scaler.fit_transform(X_train)
-            X_test = scaler.transform(X_test)
-
-            clf.fit(X_train, y_train)
-            y_pred = clf.predict(X_test)
+            clf.fit(K_train, y_train)
+            y_pred = clf.predict(K_test)
 
             accuracy_scores.append(accuracy_score(y_test, y_pred))
 
@@ -4,7 +4,6 @@
 # the Persistent Weisfeiler--Lehman kernel.
 
 
-import igraph as ig
 import numpy as np
 
 import matplotlib.pyplot as plt
@@ -17,19 +16,19 @@ import logging
 from sklearn.metrics import accuracy_score
 from sklearn.preprocessing import LabelEncoder
 from sklearn.preprocessing import MinMaxScaler
-from sklearn.preprocessing import StandardScaler
 from sklearn.svm import SVC
 
 from features import FeatureSelector
 from features import PersistentWeisfeilerLehman
 
 
+from utilities import read_graphs
 from utilities import read_labels
 
 
 def main(args, logger):
 
-    graphs = [ig.read(filename) for filename in args.FILES]
+    graphs = read_graphs(args.FILES)
     labels = read_labels(args.labels)
 
     # Set the label to be uniform over all graphs in case no labels are
@@ -55,7 +54,6 @@ def main(args, logger):
     y = LabelEncoder().fit_transform(labels)
     X, num_columns_per_iteration = pwl.transform(graphs, args.num_iterations)
 
-    X = StandardScaler().fit_transform(X)
     X = MinMaxScaler().fit_transform(X)
 
     logger.info('Finished persistent Weisfeiler-Lehman transformation')
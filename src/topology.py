@@ -10,6 +10,9 @@ import itertools
 import igraph as ig
 import numpy as np
 
+from numba import njit
+from numba import prange
+
 
 class PersistenceDiagram(collections.abc.Sequence):
     '''
@@ -19,22 +22,78 @@ class PersistenceDiagram(collections.abc.Sequence):
     '''
 
     def __init__(self):
-        self._pairs = []
+        # Creation values, destruction values, and indices of all pairs
+        # are stored in separate arrays. Pairs are appended to a list
+        # first, which is only merged into the arrays when the diagram
+        # is accessed; this avoids copying arrays for every new pair.
+        self._x = np.empty(0, dtype=np.float64)
+        self._y = np.empty(0, dtype=np.float64)
+        self._index = np.empty(0, dtype=np.int64)
+        self._pending = []
         self._betti = None
 
+        # Caches the norms of the diagram for every exponent; they are
+        # invalidated whenever the diagram changes.
+        self._total_persistence = {}
+        self._infinity_norm = {}
+
+    def _flush(self):
+        '''
+        Merges all pending pairs into the arrays of the diagram.
+        Missing indices are stored as -1.
+        '''
+
+        if not self._pending:
+            return
+
+        x, y, index = zip(*self._pending)
+        index = [-1 if c is None else c for c in index]
+
+        self._x = np.concatenate((self._x, x))
+        self._y = np.concatenate((self._y, y))
+        self._index = np.concatenate((self._index, index)).astype(np.int64)
+        self._pending = []
+
     def __len__(self):
         '''
         Returns the number of pairs in the persistence diagram.
         '''
 
-        return len(self._pairs)
+        return len(self._x) + len(self._pending)
 
     def __getitem__(self, index):
         '''
-        Returns the persistence pair at the given index.
+        Returns the persistence pair at the given index. Slices result
+        in a list of persistence pairs.
         '''
 
-        return self._pairs[index]
+        self._flush()
+
+        if isinstance(index, slice):
+            indices = [
+                None if c < 0 else c for c in self._index[index].tolist()
+            ]
+
+            return list(
+                zip(self._x[index].tolist(), self._y[index].tolist(), indices)
+            )
+
+        c = self._index[index].item()
+        return self._x[index].item(), self._y[index].item(), \
+            None if c < 0 else c
+
+    def __iter__(self):
+        '''
+        Iterates over all persistence pairs of the diagram.
+        '''
+
+        self._flush()
+
+        index = self._index.tolist()
+        if np.any(self._index < 0):
+            index = [None if c < 0 else c for c in index]
+
+        return zip(self._x.tolist(), self._y.tolist(), index)
 
     def append(self, x, y, index=None):
         '''
@@ -48,21 +107,84 @@ class PersistenceDiagram(collections.abc.Sequence):
         pair using information stored *outside* the diagram.
         '''
 
-        self._pairs.append((x, y, index))
+        self._pending.append((x, y, index))
+
+        self._total_persistence.clear()
+        self._infinity_norm.clear()
+
+    def append_many(self, x, y, index):
+        '''
+        Appends multiple persistence pairs to the given diagram at once.
+        Performs no other validity checks.
+
+        :param x: Creation values of the given persistence pairs
+        :param y: Destruction values of the given persistence pairs
+        :param index: Indices of the given persistence pairs
+        '''
+
+        # Ensures that the new pairs are stored after all pairs that
+        # have been appended individually.
+        self._flush()
+
+        # Nothing to concatenate if the diagram is still empty, which
+        # is the case for newly-calculated diagrams.
+        if len(self._x) == 0:
+            self._x = np.asarray(x, dtype=np.float64)
+            self._y = np.asarray(y, dtype=np.float64)
+            self._index = np.asarray(index, dtype=np.int64)
+        else:
+            self._x = np.concatenate((self._x, x))
+            self._y = np.concatenate((self._y, y))
+            self._index = np.concatenate((self._index, index)).astype(np.int64)
+
+        self._total_persistence.clear()
+        self._infinity_norm.clear()
+
+    def stats(self, p=1):
+        '''
+        Calculates the total persistence and the infinity norm of the
+        current pairing at once, requiring only a single pass over the
+        persistence values.
+
+        :param p: Exponent for the persistence values
+
+        :return: Tuple consisting of the total persistence and the
+        infinity norm, which is `None` for an empty diagram
+        '''
+
+        if p not in self._total_persistence:
+            self._flush()
+
+            persistence = np.abs(self._x - self._y)
+            if p != 1:
+                persistence **= p
+
+            self._total_persistence[p] = np.sum(persistence)**(1.0 / p)
+            self._infinity_norm[p] = \
+                np.max(persistence) if len(persistence) > 0 else None
+
+        return self._total_persistence[p], self._infinity_norm[p]
 
     def total_persistence(self, p=1):
         '''
         Calculates the total persistence of the current pairing.
         '''
 
-        return sum([abs(x - y)**p for x, y, _ in self._pairs])**(1.0 / p)
+        return self.stats(p)[0]
 
     def infinity_norm(self, p=1):
         '''
         Calculates the infinity norm of the current pairing.
         '''
 
-        return max([abs(x - y)**p for x, y, _ in self._pairs])
+        infinity_norm = self.stats(p)[1]
+
+        if infinity_norm is None:
+            raise ValueError(
+                'Infinity norm of an empty persistence diagram is undefined'
+            )
+
+        return infinity_norm
 
     def remove_diagonal(self):
         '''
@@ -70,7 +192,16 @@ class PersistenceDiagram(collections.abc.Sequence):
         y coincide.
         '''
 
-        self._pairs = [(x, y, c) for x, y, c in self._pairs if x != y]
+        self._flush()
+
+        mask = self._x != self._y
+
+        self._x = self._x[mask]
+        self._y = self._y[mask]
+        self._index = self._index[mask]
+
+        self._total_persistence.clear()
+        self._infinity_norm.clear()
 
     @property
     def betti(self):
@@ -106,14 +237,250 @@ class PersistenceDiagram(collections.abc.Sequence):
         :return: String-based representation of the diagram
         '''
 
-        return '\n'.join([f'{x} {y} [{c}]' for x, y, c in self._pairs])
+        return '\n'.join([f'{x} {y} [{c}]' for x, y, c in self])
+
+
+@njit(cache=True)
+def _find(parent, u):
+    '''
+    Finds the root of the component of u, performing path halving on
+    the way, i.e. every visited vertex is assigned its grandparent.
+
+    :param parent: Array of parents
+    :param u: Vertex
+
+    :return: Root of the component of u
+    '''
+
+    while parent[u] != u:
+        parent[u] = parent[parent[u]]
+        u = parent[u]
+
+    return u
+
+
+@njit(cache=True)
+def _merge(parent, u, v):
+    '''
+    Merges vertex u into the component of vertex v.
+
+    :param parent: Array of parents
+    :param u: First vertex
+    :param v: Second vertex
+    '''
+
+    if u != v:
+        parent[_find(parent, u)] = _find(parent, v)
+
+
+@njit(cache=True)
+def _persistence_pairs(parent, sources, targets, edge_weights, vertex_weights,
+                       unpaired_value):
+    '''
+    Calculates the persistence pairs of a graph filtration by merging
+    the components of the endpoints of its edges in the given order.
+    The younger component, i.e. the one whose root has the smaller
+    index, is always merged into the older one. Afterwards, a pair is
+    added for every remaining component.
+
+    :param parent: Array of parents of a Union--Find data structure,
+    which will be modified
+    :param sources: Source vertex of every edge
+    :param targets: Target vertex of every edge
+    :param edge_weights: Weight of every edge
+    :param vertex_weights: Weight of every vertex
+    :param unpaired_value: Destruction value of the pairs of components
+    that are never merged
+
+    :return: Tuple consisting of the creation values, the destruction
+    values, and the indices of the younger components of all pairs,
+    followed by a mask that indicates which edges create a cycle and
+    the number of components
+    '''
+
+    n = len(sources)
+
+    # Every edge creates at most one pair; in addition, there is one
+    # pair for every component.
+    creation = np.empty(n + len(parent), dtype=np.float64)
+    destruction = np.empty(n + len(parent), dtype=np.float64)
+    index = np.empty(n + len(parent), dtype=np.int64)
+    cycles = np.zeros(n, dtype=np.bool_)
+
+    num_pairs = 0
+
+    for k in range(n):
+        u = _find(parent, sources[k])
+        v = _find(parent, targets[k])
+
+        # Nothing to do here: the two components are already the same
+        if u == v:
+            cycles[k] = True
+            continue
+
+        younger = min(u, v)
+        older = max(u, v)
+
+        creation[num_pairs] = vertex_weights[younger]
+        destruction[num_pairs] = edge_weights[k]
+        index[num_pairs] = younger
+
+        parent[younger] = older
+        num_pairs += 1
+
+    num_roots = 0
+
+    for root in range(len(parent)):
+        if parent[root] == root:
+            creation[num_pairs] = vertex_weights[root]
+            destruction[num_pairs] = unpaired_value
+            index[num_pairs] = root
+
+            num_pairs += 1
+            num_roots += 1
+
+    return (
+        creation[:num_pairs],
+        destruction[:num_pairs],
+        index[:num_pairs],
+        cycles,
+        num_roots
+    )
+
+
+@njit(cache=True, parallel=True)
+def _persistence_pairs_many(vertex_offsets, edge_offsets, sources, targets,
+                            edge_weights, vertex_weights, unpaired_values):
+    '''
+    Calculates the persistence pairs of multiple graph filtrations in
+    parallel. The vertices and edges of all graphs are stored
+    consecutively; vertex indices are local to their respective graph.
+
+    :param vertex_offsets: Index of the first vertex of every graph,
+    followed by the total number of vertices
+    :param edge_offsets: Index of the first edge of every graph,
+    followed by the total number of edges
+    :param sources: Source vertex of every edge
+    :param targets: Target vertex of every edge
+    :param edge_weights: Weight of every edge
+    :param vertex_weights: Weight of every vertex
+    :param unpaired_values: Destruction value of the pairs of components
+    that are never merged, one for every graph
+
+    :return: Tuple consisting of the creation values, the destruction
+    values, and the indices of all pairs, a mask that indicates which
+    edges create a cycle, the number of pairs of every graph, and the
+    number of components of every graph. The pairs of the ith graph
+    start at `vertex_offsets[i] + edge_offsets[i]`.
+    '''
+
+    n = len(vertex_offsets) - 1
+    num_pairs = vertex_offsets[-1] + edge_offsets[-1]
+
+    creation = np.empty(num_pairs, dtype=np.float64)
+    destruction = np.empty(num_pairs, dtype=np.float64)
+    index = np.empty(num_pairs, dtype=np.int64)
+    cycles = np.zeros(edge_offsets[-1], dtype=np.bool_)
+    counts = np.zeros(n, dtype=np.int64)
+    num_roots = np.zeros(n, dtype=np.int64)
+
+    for g in prange(n):
+        v0, v1 = vertex_offsets[g], vertex_offsets[g + 1]
+        e0, e1 = edge_offsets[g], edge_offsets[g + 1]
+
+        c, d, i, cycles_, num_roots[g] = _persistence_pairs(
+            np.arange(v1 - v0).astype(np.int32),
+            sources[e0:e1],
+            targets[e0:e1],
+            edge_weights[e0:e1],
+            vertex_weights[v0:v1],
+            unpaired_values[g]
+        )
+
+        start = v0 + e0
+        counts[g] = len(c)
+
+        creation[start:start + len(c)] = c
+        destruction[start:start + len(c)] = d
+        index[start:start + len(c)] = i
+        cycles[e0:e1] = cycles_
+
+    return creation, destruction, index, cycles, counts, num_roots
+
+
+@njit(cache=True)
+def _counting_sort(keys, num_keys):
+    '''
+    Calculates the indices that sort an array of non-negative integer
+    keys in a stable manner, using counting sort.
+
+    :param keys: Array of keys
+    :param num_keys: Number of possible keys, i.e. an upper bound on all
+    keys in the array
+
+    :return: Indices that sort the keys
+    '''
+
+    counts = np.zeros(num_keys + 1, dtype=np.int64)
+    for key in keys:
+        counts[key + 1] += 1
+
+    # Position of the first element with a given key in the output
+    offsets = np.cumsum(counts)
+
+    indices = np.empty(len(keys), dtype=np.int64)
+    for i in range(len(keys)):
+        indices[offsets[keys[i]]] = i
+        offsets[keys[i]] += 1
+
+    return indices
+
+
+def _stable_argsort(weights, descending=False):
+    '''
+    Calculates the indices that sort an array of weights in a stable
+    manner. If there are sufficiently many weights and all of them are
+    integers from a small range, which is the case for many filtrations,
+    counting sort is used; otherwise, the function falls back to
+    a comparison-based sort.
+
+    :param weights: Array of weights
+    :param descending: If set, sorts the weights in descending order.
+    Equal weights keep their relative order in both cases, so the
+    result is *not* the reverse of the ascending order.
+
+    :return: Indices that sort the weights
+    '''
+
+    # For small arrays, the additional checks are more expensive than
+    # the comparison-based sort itself.
+    if len(weights) < 1000:
+        return np.argsort(-weights if descending else weights, kind='stable')
+
+    minimum = weights.min()
+    maximum = weights.max()
+    num_keys = maximum - minimum + 1
+
+    if num_keys <= 4 * len(weights) and np.all(weights == np.floor(weights)):
+
+        # The keys are shifted such that they are non-negative; for the
+        # descending order, this also takes care of the negation.
+        if descending:
+            keys = maximum - weights
+        else:
+            keys = weights - minimum
+
+        return _counting_sort(keys.astype(np.int64), int(num_keys))
+    else:
+        return np.argsort(-weights if descending else weights, kind='stable')
 
 
 class UnionFind:
     '''
     An implementation of a Union--Find class. The class performs path
-    compression by default. It uses integers for storing one disjoint
-    set, assuming that vertices are zero-indexed.
+    compression, in the form of path halving, by default. It uses an
+    array of integers for storing one disjoint set, assuming that
+    vertices are zero-indexed.
     '''
 
     def __init__(self, num_vertices):
@@ -122,19 +489,14 @@ class UnionFind:
         number of vertices.
         '''
 
-        self._parent = [x for x in range(num_vertices)]
+        self._parent = np.arange(num_vertices, dtype=np.int32)
 
     def find(self, u):
         '''
         Finds and returns the parent of u with respect to the hierarchy.
         '''
 
-        if self._parent[u] == u:
-            return u
-        else:
-            # Perform path collapse operation
-            self._parent[u] = self.find(self._parent[u])
-            return self._parent[u]
+        return _find(self._parent, u)
 
     def merge(self, u, v):
         '''
@@ -142,18 +504,16 @@ class UnionFind:
         asymmetry of this operation.
         '''
 
-        if u != v:
-            self._parent[self.find(u)] = self.find(v)
+        _merge(self._parent, u, v)
 
     def roots(self):
         '''
-        Generator expression for returning roots, i.e. components that
-        are their own parents.
+        Returns roots, i.e. components that are their own parents.
+
+        :return: Array of roots in ascending order
         '''
 
-        for vertex, parent in enumerate(self._parent):
-            if vertex == parent:
-                yield vertex
+        return np.flatnonzero(self._parent == np.arange(len(self._parent)))
 
 
 class PersistenceDiagramCalculator:
@@ -190,6 +550,66 @@ class PersistenceDiagramCalculator:
                 '''.format(self._order)
             )
 
+    def _prepare_filtration(self, graph):
+        '''
+        Extracts the filtration of a graph in the form of arrays, which
+        are used by the jitted functions for calculating persistence
+        pairs.
+
+        :param graph: Weighted graph
+
+        :return: Tuple consisting of the edge indices in the order of
+        the filtration, the endpoints and weights of all edges in this
+        order, the weights of all vertices, and the unpaired value
+        '''
+
+        num_vertices = graph.vcount()
+
+        # All edge weights; their type is fixed such that the jitted
+        # functions do not have to be compiled for other types.
+        edge_weights = np.asarray(graph.es['weight'], dtype=np.float64)
+        edge_indices = None                           # Ordering for filtration
+
+        if self._order == 'sublevel':
+            edge_indices = _stable_argsort(edge_weights)
+        elif self._order == 'superlevel':
+            edge_indices = _stable_argsort(edge_weights, descending=True)
+
+        assert edge_indices is not None
+
+        # Endpoints of all edges, obtained with a single call instead of
+        # querying the edges individually, in the order of the filtration
+        edges = np.array(graph.get_edgelist(), dtype=np.int64)
+        edges = edges.reshape(-1, 2)[edge_indices]
+
+        # Vertex attributes have been set, so we use them for the
+        # persistence diagram creation. Otherwise, every vertex is
+        # assigned a value of zero.
+        if self._vertex_attribute:
+            vertex_weights = np.asarray(
+                graph.vs[self._vertex_attribute], dtype=np.float64
+            )
+        else:
+            vertex_weights = np.zeros(num_vertices)
+
+        # By default, use the largest (sublevel set) or lowest
+        # (superlevel set) weight, i.e. the last weight of the
+        # filtration, unless the user specified a different one. An
+        # explicit value of zero is valid, and it makes it possible
+        # to handle graphs without any edges.
+        if self._unpaired_value is not None:
+            unpaired_value = self._unpaired_value
+        else:
+            unpaired_value = edge_weights[edge_indices[-1]]
+
+        return (
+            edge_indices,
+            edges,
+            edge_weights[edge_indices],
+            vertex_weights,
+            unpaired_value
+        )
+
     def fit_transform(self, graph):
         '''
         Applies a filtration to a graph and calculates its persistence
@@ -200,94 +620,107 @@ class PersistenceDiagramCalculator:
         calculated.
 
         :return: Tuple consisting of the persistence diagram, followed
-        by a list of all edge indices that create a cycle.
+        by an array of all edge indices that create a cycle.
         '''
 
-        num_vertices = graph.vcount()
-        uf = UnionFind(num_vertices)
+        uf = UnionFind(graph.vcount())
 
-        edge_weights = np.array(graph.es['weight'])   # All edge weights
-        edge_indices = None                           # Ordering for filtration
-        edge_indices_cycles = []                      # Edge indices of cycles
+        edge_indices, edges, edge_weights, vertex_weights, unpaired_value = \
+            self._prepare_filtration(graph)
 
-        if self._order == 'sublevel':
-            edge_indices = np.argsort(edge_weights, kind='stable')
-        elif self._order == 'superlevel':
-            edge_indices = np.argsort(-edge_weights, kind='stable')
+        # Will be filled below. This will become the return value of
+        # the function.
+        pd = PersistenceDiagram()
 
-        assert edge_indices is not None
+        # Go over all edges in the order of the filtration and create
+        # new points for the persistence diagram. The creation value
+        # of a point is the weight of the younger component, whereas
+        # the destruction value is the weight of the edge. Afterwards,
+        # tuples are added for every root component in the Union--Find
+        # data structure. This ensures that multiple connected
+        # components are handled correctly.
+        creation, destruction, index, cycles, num_roots = \
+            _persistence_pairs(
+                uf._parent,
+                edges[:, 0],
+                edges[:, 1],
+                edge_weights,
+                vertex_weights,
+                unpaired_value
+            )
 
-        # Will be filled during the iteration below. This will become
-        # the return value of the function.
-        pd = PersistenceDiagram()
+        pd.append_many(creation, destruction, index)
+
+        if num_roots > 0:
+            pd.betti = num_roots
+
+        edge_indices_cycles = edge_indices[cycles]
+
+        return pd, edge_indices_cycles
 
-        # Go over all edges and optionally create new points for the
-        # persistence diagram.
-        for edge_index, edge_weight in \
-                zip(edge_indices, edge_weights[edge_indices]):
-            u, v = graph.es[edge_index].tuple
+    def fit_transform_many(self, graphs):
+        '''
+        Calculates the persistence diagrams of multiple graphs. This is
+        equivalent to calling `fit_transform()` for every graph, but the
+        calculations are performed for all graphs in parallel.
 
-            # Preliminary assignment of younger and older component. We
-            # will check below whether this is actually correct, for it
-            # is possible that u is actually the older one.
-            younger = uf.find(u)
-            older = uf.find(v)
+        :param graphs: Sequence of weighted graphs
 
-            # Nothing to do here: the two components are already the
-            # same
-            if younger == older:
-                edge_indices_cycles.append(edge_index)
-                continue
+        :return: List of tuples, each consisting of the persistence
+        diagram of a graph, followed by an array of all edge indices
+        that create a cycle.
+        '''
 
-            # Ensures that the older component precedes the younger one
-            # in terms of its vertex index
-            elif younger > older:
-                u, v = v, u
-                younger, older = older, younger
+        # Graphs are not accessed in the parallel region; instead, their
+        # filtrations are stored consecutively.
+        filtrations = [self._prepare_filtration(graph) for graph in graphs]
 
-            vertex_weight = 0.0
+        if not filtrations:
+            return []
 
-            # Vertex attributes have been set, so we use them for the
-            # persistence diagram creation below.
-            if self._vertex_attribute:
-                vertex_weight = graph.vs[self._vertex_attribute][younger]
+        edge_indices, edges, edge_weights, vertex_weights, unpaired_values = \
+            zip(*filtrations)
 
-            creation = vertex_weight    # x coordinate for persistence diagram
-            destruction = edge_weight   # y coordinate for persistence diagram
+        vertex_offsets = np.zeros(len(graphs) + 1, dtype=np.int64)
+        vertex_offsets[1:] = np.cumsum([len(w) for w in vertex_weights])
 
-            uf.merge(u, v)
-            pd.append(creation, destruction, younger)
+        edge_offsets = np.zeros(len(graphs) + 1, dtype=np.int64)
+        edge_offsets[1:] = np.cumsum([len(w) for w in edge_weights])
 
-        # By default, use the largest (sublevel set) or lowest
-        # (superlevel set) weight, unless the user specified a
-        # different one.
-        unpaired_value = edge_weights[edge_indices[-1]]
-        if self._unpaired_value:
-            unpaired_value = self._unpaired_value
+        edges = np.concatenate(edges)
 
-        # Add tuples for every root component in the Union--Find data
-        # structure. This ensures that multiple connected components
-        # are handled correctly.
-        for root in uf.roots():
+        creation, destruction, index, cycles, counts, num_roots = \
+            _persistence_pairs_many(
+                vertex_offsets,
+                edge_offsets,
+                edges[:, 0],
+                edges[:, 1],
+                np.concatenate(edge_weights),
+                np.concatenate(vertex_weights),
+                np.asarray(unpaired_values, dtype=np.float64)
+            )
+
+        result = []
 
-            vertex_weight = 0.0
+        for g in range(len(graphs)):
+            start = vertex_offsets[g] + edge_offsets[g]
+            end = start + counts[g]
 
-            # Vertex attributes have been set, so we use them for the
-            # creation of the root tuple.
-            if self._vertex_attribute:
-                vertex_weight = graph.vs[self._vertex_attribute][root]
+            pd = PersistenceDiagram()
+            pd.append_many(
+                creation[start:end], destruction[start:end], index[start:end]
+            )
 
-            creation = vertex_weight
-            destruction = unpaired_value
+            if num_roots[g] > 0:
+                pd.betti = int(num_roots[g])
 
-            pd.append(creation, destruction, root)
+            edge_indices_cycles = edge_indices[g][
+                cycles[edge_offsets[g]:edge_offsets[g + 1]]
+            ]
 
-            if pd.betti is not None:
-                pd.betti = pd.betti + 1
-            else:
-                pd.betti = 1
+            result.append((pd, edge_indices_cycles))
 
-        return pd, edge_indices_cycles
+        return result
 
 
 def assign_filtration_values(
@@ -307,7 +740,7 @@ def assign_filtration_values(
     :return: Graph with added edges
     '''
 
-    selection_function = max if order == 'sublevel' else min
+    selection_function = np.maximum if order == 'sublevel' else np.minimum
 
     if normalize:
         offset = np.max(attributes) if order == 'sublevel' \
@@ -315,14 +748,14 @@ def assign_filtration_values(
     else:
         offset = 1.0
 
-    for edge in graph.es:
-        source = edge.source
-        target = edge.target
+    attributes = np.asarray(attributes, dtype=np.float64) / offset
 
-        source_weight = attributes[source] / offset
-        target_weight = attributes[target] / offset
-        edge_weight = selection_function(source_weight, target_weight)
+    edges = np.array(graph.get_edgelist(), dtype=np.int64).reshape(-1, 2)
+    edge_weights = selection_function(
+        attributes[edges[:, 0]],
+        attributes[edges[:, 1]]
+    )
 
-        edge['weight'] = edge_weight
+    graph.es['weight'] = edge_weights.tolist()
 
     return graph
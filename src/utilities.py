@@ -4,6 +4,10 @@ scripts.
 '''
 
 
+import joblib
+import os
+
+import igraph as ig
 import numpy as np
 
 
@@ -21,6 +25,42 @@ def read_labels(filename):
     return labels
 
 
+def _read_graphs(filenames, modification_times, n_jobs):
+    return joblib.Parallel(n_jobs=n_jobs, backend='threading')(
+        joblib.delayed(ig.read)(filename) for filename in filenames
+    )
+
+
+def read_graphs(filenames, n_jobs=-1, cache_dir=None):
+    '''
+    Reads graphs from a sequence of files in parallel. Since parsing is
+    mostly done by `igraph` itself, threads are sufficient for this.
+    The order of the graphs corresponds to the order of the files.
+
+    :param filenames: Sequence of filenames
+    :param n_jobs: Number of threads for reading the files
+    :param cache_dir: Optional cache directory; if specified, the graphs
+    are stored in a single file, keyed by the filenames and the times of
+    their last modification.
+
+    :return: List of graphs
+    '''
+
+    filenames = list(filenames)
+
+    if cache_dir is None:
+        return _read_graphs(filenames, None, n_jobs)
+
+    # Modification times ensure that changed files are not taken from
+    # the cache.
+    modification_times = [os.path.getmtime(f) for f in filenames]
+
+    memory = joblib.Memory(location=cache_dir, verbose=0)
+    return memory.cache(_read_graphs, ignore=['n_jobs'])(
+        filenames, modification_times, n_jobs
+    )
+
+
 def to_probability_distribution(persistence_diagram, l, L):
     '''
     Converts a persistence diagram with labels to a (discrete)
@@ -51,3 +91,38 @@ def to_probability_distribution(persistence_diagram, l, L):
     # weight varies.
     P = P / np.sum(P)
     return P
+
+
+def _transform(transformer, graphs, num_iterations):
+    return transformer.transform(graphs, num_iterations)
+
+
+def cached_transform(transformer, graphs, num_iterations, cache_dir=None):
+    '''
+    Applies a feature transformer, such as the persistent
+    Weisfeiler--Lehman transformation, to a sequence of graphs and
+    optionally caches the result on disk. The cache is keyed by the
+    configuration of the transformer, the graphs (including all their
+    attributes), and the number of iterations.
+
+    Since the cache does *not* detect changes to the code of the
+    transformer, it has to be cleared manually in such cases. Moreover,
+    on a cache hit, the transformer will not store any auxiliary data,
+    such as persistence diagrams.
+
+    :param transformer: Object with a `transform(graphs, num_iterations)`
+    function
+    :param graphs: Sequence of graphs
+    :param num_iterations: Number of Weisfeiler--Lehman iterations
+    :param cache_dir: Optional cache directory; if not specified, no
+    caching will be performed.
+
+    :return: Result of the transformation, i.e. the feature matrix and
+    the number of columns per iteration
+    '''
+
+    if cache_dir is None:
+        return _transform(transformer, graphs, num_iterations)
+
+    memory = joblib.Memory(location=cache_dir, verbose=0)
+    return memory.cache(_transform)(transformer, graphs, num_iterations)
@@ -1,10 +1,22 @@
 from collections import defaultdict
+import joblib
 import numpy as np
-#import leidenalg
-from numpy import inf
+import scipy.sparse
 
 def count_triangles(graph):
-    return len(graph.cliques(min=3, max=3))
+    # Every triangle corresponds to six closed walks of length three
+    # in an undirected graph without loops.
+    edges = np.array(graph.get_edgelist(), dtype=np.int64).reshape(-1, 2)
+    edges = edges[edges[:, 0] != edges[:, 1]]
+
+    n = graph.vcount()
+    A = scipy.sparse.csr_matrix(
+        (np.ones(len(edges)), (edges[:, 0], edges[:, 1])), shape=(n, n)
+    )
+
+    # Symmetrize and remove multiple edges
+    A = ((A + A.T) > 0).astype(np.int64)
+    return int((A @ A).multiply(A).sum() // 6)
 
 def cluster_coef(graph):
     return graph.transitivity_avglocal_undirected(mode='zero')
@@ -16,41 +28,32 @@ def count_vertices(graph):
     return len(graph.vs)
 
 def char_path_length(graph):
-    shortest_paths = np.asarray(graph.shortest_paths())
-    upper_tri = shortest_paths[np.triu_indices(len(shortest_paths))]
-    upper_tri[upper_tri == inf] = 0
-    return np.mean(upper_tri)
+    # Path lengths are integers, so single precision is exact for them
+    shortest_paths = np.asarray(graph.shortest_paths(), dtype=np.float32)
+    shortest_paths[np.isinf(shortest_paths)] = 0
+    # Mean over the upper triangle, including the diagonal, without
+    # materializing its indices
+    n = len(shortest_paths)
+    return np.sum(np.triu(shortest_paths)) / (n * (n + 1) / 2)
 
 def modularity(graph):
+    # Not available in all environments, so it is only required when
+    # modularity is actually calculated.
+    import leidenalg
+
     partitions = leidenalg.find_partition(graph,
                                           leidenalg.ModularityVertexPartition)
 
-    # Calculate v
-    v = 0
-    for i in graph.vs:
-        # Since we assigned all edges the weight 1, we can use the number of
-        # neighbors as sum over weights
-        neighbors_of_i = graph.neighbors(i)
-        v += len(neighbors_of_i)
-
-    a = []
-    deltas = []
-    for i in graph.vs:
-        neighbors_i = graph.neighbors(i)
-        s_i = len(neighbors_of_i)
+    membership = np.array(partitions.membership)
 
-        for j in neighbors_of_i:
-            s_j = len(graph.neighbors(j))
-            a.append((s_i*s_j)/v)
+    # Since we assigned all edges the weight 1, the degree of a vertex
+    # is the sum over the weights of its edges.
+    A = np.array(graph.get_adjacency().data)
+    degrees = A.sum(axis=1)
+    v = degrees.sum()
 
-            deltas.append(np.all([i.index in community_i for community_i in
-                                  list(partitions)] == [j in community_j for
-                                                       community_j in
-                                                       list(partitions)]))
-
-        deltas = np.array(deltas)
-        ones = np.ones(len(deltas))
-        return v*np.sum((ones-a)*deltas)
+    same_community = membership[:, None] == membership[None, :]
+    return np.sum((A - np.outer(degrees, degrees) / v) * same_community) / v
 
 
 stat_funcs = {'num_tri': count_triangles, 'cluster_coef': cluster_coef,
@@ -58,17 +61,45 @@ stat_funcs = {'num_tri': count_triangles, 'cluster_coef': cluster_coef,
               'char_path': char_path_length, 'modularity': modularity}
 
 
+def _calculate_stats(graphs, stats):
+    # Calculates all requested statistics for a chunk of graphs, such
+    # that every graph only has to be sent to a worker once.
+    return [[stat_funcs[stat](g) for stat in stats] for g in graphs]
+
+
 def visualize_graph_stats(graphs: list, labels: list, stats: list=['num_tri',
                                                                    'cluster_coef',
                                                                   'edge_count',
                                                                   'vertex_count',
                                                                   'char_path',
-                                                                   ]):
+                                                                   ],
+                          n_jobs=-1):
     result = defaultdict(dict)
 
-    for stat in stats:
-        current_stats = np.array([stat_funcs[stat](g) for g in graphs])
-        for label in labels:
-            result[stat][label] = current_stats[np.where(labels == label)]
+    # All statistics of all graphs are independent of each other. Each
+    # worker handles a contiguous chunk of graphs because the individual
+    # statistics are too cheap to be dispatched on their own.
+    n_chunks = min(len(graphs), joblib.effective_n_jobs(n_jobs))
+    bounds = np.linspace(0, len(graphs), n_chunks + 1).astype(int)
+
+    chunks = joblib.Parallel(n_jobs=n_jobs)(
+        joblib.delayed(_calculate_stats)(graphs[start:end], stats)
+        for start, end in zip(bounds[:-1], bounds[1:])
+    )
+
+    values = np.array(
+        [row for chunk in chunks for row in chunk]
+    ).reshape(len(graphs), len(stats)).T
+
+    # Partition the graphs by their labels once; a stable sort ensures
+    # that the graphs of each label remain in their original order.
+    labels = np.asarray(labels)
+    order = np.argsort(labels, kind='stable')
+    unique_labels, first = np.unique(labels[order], return_index=True)
+
+    for stat, current_stats in zip(stats, values):
+        result[stat] = dict(
+            zip(unique_labels, np.split(current_stats[order], first[1:]))
+        )
 
     return result
@@ -1,4 +1,3 @@
-import copy
 from collections import defaultdict
 from typing import List
 
@@ -34,13 +33,15 @@ class WeisfeilerLehman(TransformerMixin):
             x = g.copy()
             labels = x.vs['label']
 
+            # Labels are compressed in the order of their first
+            # appearance; every label requires a single lookup only.
             new_labels = []
             for label in labels:
-                if label in self._preprocess_relabel_dict.keys():
-                    new_labels.append(self._preprocess_relabel_dict[label])
-                else:
-                    self._preprocess_relabel_dict[label] = self._get_next_label()
-                    new_labels.append(self._preprocess_relabel_dict[label])
+                new_label = self._preprocess_relabel_dict.get(label)
+                if new_label is None:
+                    new_label = self._get_next_label()
+                    self._preprocess_relabel_dict[label] = new_label
+                new_labels.append(new_label)
             x.vs['label'] = new_labels
             self._results[0][i] = (labels, new_labels)
             preprocessed_graphs.append(x)
@@ -49,6 +50,11 @@ class WeisfeilerLehman(TransformerMixin):
 
     def fit_transform(self, X: List[ig.Graph], num_iterations: int=3):
         X = self._relabel_graphs(X)
+
+        # The topology of the graphs does not change over the
+        # iterations, so their adjacency lists are only created once.
+        adjacency_lists = [g.get_adjlist() for g in X]
+
         for it in np.arange(1, num_iterations+1, 1):
             self._reset_label_generation()
             self._label_dict = {}
@@ -57,41 +63,52 @@ class WeisfeilerLehman(TransformerMixin):
                 current_labels = g.vs['label']
 
                 # Get for each vertex the labels of its neighbors
-                neighbor_labels = self._get_neighbor_labels(g, sort=True)
+                neighbor_labels = self._get_neighbor_labels(
+                    g, sort=True, adjacency_list=adjacency_lists[i]
+                )
 
                 # Prepend the vertex label to the list of labels of its neighbors
                 merged_labels = [[b]+a for a,b in zip(neighbor_labels, current_labels)]
 
-                # Generate a label dictionary based on the merged labels
-                self._append_label_dict(merged_labels)
-
-                # Relabel the graph
+                # Relabel the graph, extending the label dictionary based
+                # on the merged labels
                 new_labels = self._relabel_graph(g, merged_labels)
                 self._relabel_steps[i][it] = { idx: {old_label: new_labels[idx]} for idx, old_label in enumerate(current_labels) }
                 g.vs['label'] = new_labels
 
                 self._results[it][i] = (merged_labels, new_labels)
-            self._label_dicts[it] = copy.deepcopy(self._label_dict)
+            # The dictionary is replaced in the next iteration, so it
+            # can be stored without copying it.
+            self._label_dicts[it] = self._label_dict
         return self._results
 
     def _relabel_graph(self, X: ig.Graph, merged_labels: list):
+        # Every multiset of labels is converted to a key only once; its
+        # new label is either looked up or, if it has not been seen in
+        # this iteration yet, generated and added to the dictionary.
+        # Tuples are hashed directly, which is considerably faster than
+        # converting them to strings first.
         new_labels = []
         for merged in merged_labels:
-            new_labels.append(self._label_dict['-'.join(map(str,merged))])
+            dict_key = tuple(merged)
+            label = self._label_dict.get(dict_key)
+            if label is None:
+                label = self._get_next_label()
+                self._label_dict[dict_key] = label
+            new_labels.append(label)
         return new_labels
 
-    def _append_label_dict(self, merged_labels: List[list]):
-        for merged_label in merged_labels:
-            dict_key = '-'.join(map(str,merged_label))
-            if dict_key not in self._label_dict.keys():
-                self._label_dict[ dict_key ] = self._get_next_label()
-
-    def _get_neighbor_labels(self, X: ig.Graph, sort: bool=True):
-            neighbor_indices = [[n_v.index for n_v in X.vs[X.neighbors(v.index)]] for v in X.vs]
+    def _get_neighbor_labels(self, X: ig.Graph, sort: bool=True,
+                             adjacency_list: list=None):
+            # Use the adjacency list and the labels of all vertices
+            # directly instead of creating vertex sequences
+            if adjacency_list is None:
+                adjacency_list = X.get_adjlist()
+            labels = X.vs['label']
             neighbor_labels = []
-            for n_indices in neighbor_indices:
+            for n_indices in adjacency_list:
                 if sort:
-                    neighbor_labels.append( sorted(X.vs[n_indices]['label']) )
+                    neighbor_labels.append( sorted([labels[n] for n in n_indices]) )
                 else:
-                    neighbor_labels.append( X.vs[n_indices]['label'] )
+                    neighbor_labels.append( [labels[n] for n in n_indices] )
             return neighbor_labels
@@ -0,0 +1,75 @@
+import logging
+import tempfile
+import unittest
+
+import numpy as np
+
+from sklearn.model_selection import StratifiedKFold
+
+from _cv_driver import run_cv
+
+
+class Interrupted(Exception):
+    pass
+
+
+class ResumeTests(unittest.TestCase):
+
+    def setUp(self):
+        self.y = np.random.RandomState(0).randint(0, 2, 60)
+        self.logger = logging.getLogger('test')
+
+    def _fit_and_predict(self, train_index, test_index, random_state,
+                         interrupt_at=None):
+        if interrupt_at is not None and len(self.evaluated) == interrupt_at:
+            raise Interrupted()
+
+        self.evaluated.append(test_index[0])
+
+        # The parameters depend on the splits of an inner cross-validation,
+        # just like the parameters selected by a grid search.
+        cv = StratifiedKFold(
+            n_splits=3, shuffle=True, random_state=random_state
+        )
+        _, val_index = next(cv.split(train_index, self.y[train_index]))
+
+        first = int(train_index[val_index[0]])
+        return self.y[test_index], {'first': first}
+
+    def _run(self, resume_dir, seed_repetitions, interrupt_at=None):
+        self.evaluated = []
+
+        def fit_and_predict(train_index, test_index, random_state):
+            return self._fit_and_predict(
+                train_index, test_index, random_state, interrupt_at
+            )
+
+        np.random.seed(42)
+        return run_cv(
+            fit_and_predict,
+            self.y,
+            self.logger,
+            n_repetitions=3,
+            n_splits=5,
+            resume_dir=resume_dir,
+            seed_repetitions=seed_repetitions,
+        )
+
+    def test_resume(self):
+        for seed_repetitions in [True, False]:
+            with tempfile.TemporaryDirectory() as resume_dir:
+                expected = self._run(None, seed_repetitions)
+
+                with self.assertRaises(Interrupted):
+                    self._run(resume_dir, seed_repetitions, interrupt_at=7)
+
+                resumed = self._run(resume_dir, seed_repetitions)
+
+                # Only the folds missing from the interrupted run have
+                # to be evaluated again.
+                self.assertEqual(len(self.evaluated), 15 - 7)
+                self.assertEqual(expected, resumed)
+
+
+if __name__ == '__main__':
+    unittest.main()
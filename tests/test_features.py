@@ -0,0 +1,59 @@
+import math
+import unittest
+
+from features import WeightAssigner
+
+
+class KullbackLeiblerTests(unittest.TestCase):
+
+    def test_hand_computed_values(self):
+        wa = WeightAssigner(metric='kullback_leibler')
+
+        # {0, 0, 1} and {0, 2, 2} are smoothed to (3, 2, 1) / 6 and
+        # (2, 1, 3) / 6, respectively; their symmetrized divergence is
+        # log(3) / 2.
+        self.assertAlmostEqual(
+            wa._kullback_leibler([0, 0, 1], [0, 2, 2]), math.log(3) / 2
+        )
+
+        # {1} and {2} are smoothed to (2, 1) / 3 and (1, 2) / 3; their
+        # symmetrized divergence is 2 log(2) / 3.
+        self.assertAlmostEqual(
+            wa._kullback_leibler([1], [2]), 2 * math.log(2) / 3
+        )
+
+        # The Jensen--Shannon variant is scaled by one half
+        self.assertAlmostEqual(
+            wa._jensen_shannon([0, 0, 1], [0, 2, 2]), math.log(3) / 4
+        )
+        self.assertAlmostEqual(
+            wa._jensen_shannon([1], [2]), math.log(2) / 3
+        )
+
+    def test_symmetry(self):
+        wa = WeightAssigner(metric='kullback_leibler')
+
+        multisets = [
+            ([0, 0, 1], [0, 2, 2]),
+            ([1, 2, 3, 3], [3]),
+            ([5], [1, 1, 1, 4]),
+            ([0, 1, 2], [2, 1, 0, 0]),
+        ]
+
+        for A, B in multisets:
+            self.assertAlmostEqual(
+                wa._kullback_leibler(A, B), wa._kullback_leibler(B, A)
+            )
+            self.assertAlmostEqual(
+                wa._jensen_shannon(A, B), wa._jensen_shannon(B, A)
+            )
+
+    def test_identical_multisets(self):
+        wa = WeightAssigner(metric='kullback_leibler')
+
+        for A in [[0], [1, 1, 2], [3, 1, 2, 3]]:
+            self.assertEqual(wa._kullback_leibler(A, list(A)), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+
+import numpy as np
+
+from kernels import PersistenceScaleSpaceKernel
+
+
+class PairwiseTests(unittest.TestCase):
+
+    def test_pairwise(self):
+        rng = np.random.RandomState(42)
+
+        # More diagrams than fit into a single block, including empty
+        # diagrams and duplicates of earlier diagrams.
+        diagrams = []
+        for i in range(150):
+            if i % 17 == 0:
+                diagrams.append(np.empty((0, 2)))
+            elif i % 5 == 0:
+                diagrams.append(diagrams[rng.randint(len(diagrams))].copy())
+            else:
+                creation = rng.randint(0, 5, size=rng.randint(1, 8))
+                destruction = creation + rng.randint(0, 5, len(creation))
+                diagrams.append(
+                    np.column_stack((creation, destruction)).astype(float)
+                )
+
+        points = np.ascontiguousarray(np.concatenate(diagrams).T)
+        offsets = np.zeros(len(diagrams) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(D) for D in diagrams])
+
+        kernel = PersistenceScaleSpaceKernel(sigma=1.0)
+        K = kernel.pairwise(points, offsets)
+
+        expected = np.array([
+            [kernel.fit_transform(F, G) for G in diagrams] for F in diagrams
+        ])
+
+        self.assertEqual(K.shape, expected.shape)
+        np.testing.assert_allclose(K, expected, rtol=1e-5, atol=1e-6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+
+import numpy as np
+
+from topology import PersistenceDiagram
+from topology import _stable_argsort
+
+
+class PersistenceDiagramTests(unittest.TestCase):
+
+    def setUp(self):
+        self.pd = PersistenceDiagram()
+        self.pd.append(0.0, 1.0, 0)
+        self.pd.append(0.5, 2.0)
+        self.pd.append_many([1.0, 1.5], [3.0, 1.5], [2, 3])
+
+    def test_indexing(self):
+        self.assertEqual(self.pd[0], (0.0, 1.0, 0))
+        self.assertEqual(self.pd[1], (0.5, 2.0, None))
+        self.assertEqual(self.pd[-1], (1.5, 1.5, 3))
+
+    def test_slicing(self):
+        self.assertEqual(self.pd[1:3], [(0.5, 2.0, None), (1.0, 3.0, 2)])
+        self.assertEqual(self.pd[::2], [(0.0, 1.0, 0), (1.0, 3.0, 2)])
+        self.assertEqual(self.pd[:], list(self.pd))
+        self.assertEqual(self.pd[10:], [])
+
+
+class StableArgsortTests(unittest.TestCase):
+
+    def test_counting_sort(self):
+        rng = np.random.RandomState(42)
+
+        # Large integral weights from a small range contain many ties
+        # and are sorted with counting sort.
+        for w in [
+            rng.randint(0, 50, size=5000).astype(np.float64),
+            rng.randint(-20, 20, size=2000).astype(np.float64),
+        ]:
+            np.testing.assert_array_equal(
+                _stable_argsort(w), np.argsort(w, kind='stable')
+            )
+            np.testing.assert_array_equal(
+                _stable_argsort(w, descending=True),
+                np.argsort(-w, kind='stable')
+            )
+
+    def test_comparison_sort(self):
+        rng = np.random.RandomState(42)
+
+        # Small arrays and non-integral weights use the fallback
+        for w in [
+            rng.randint(0, 5, size=100).astype(np.float64),
+            rng.randint(0, 50, size=5000) / 4.0,
+        ]:
+            np.testing.assert_array_equal(
+                _stable_argsort(w), np.argsort(w, kind='stable')
+            )
+            np.testing.assert_array_equal(
+                _stable_argsort(w, descending=True),
+                np.argsort(-w, kind='stable')
+            )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,12 @@
 import unittest
 
+from collections import Counter
+
+import igraph as ig
+import numpy as np
+
+from weisfeiler_lehman import WeisfeilerLehman as WL
+
 class WeisfeilerLehmanTests(unittest.TestCase):
     
     def test_relabeling_graph_single(self):
@@ -15,7 +22,7 @@ class WeisfeilerLehmanTests(unittest.TestCase):
         self.assertEqual(wl._preprocess_relabel_dict, expected_preprocessing_relabeling)
 
         # First iteration relabeling
-        expected_relabeling = { '0-1-2-3': 0, '1-0-2': 1, '2-0-1': 2, '3-0-4-4': 3, '4-3': 4 }
+        expected_relabeling = { (0,1,2,3): 0, (1,0,2): 1, (2,0,1): 2, (3,0,4,4): 3, (4,3): 4 }
         self.assertEqual(expected_relabeling, wl._label_dict)
 
         # Expected labels of transformed graph
@@ -23,7 +30,7 @@ class WeisfeilerLehmanTests(unittest.TestCase):
         self.assertEqual(expected_labels, graph_transformed[1][0][1])
 
         # Expected sorted label counts before  and after WL iteration
-        unique_label_counts_before = sorted(Counter([ '-'.join(np.asarray(x).astype(str)) for x in graph_transformed[1][0][0]]).values())
+        unique_label_counts_before = sorted(Counter([ tuple(x) for x in graph_transformed[1][0][0]]).values())
         unique_label_counts_after = sorted(Counter(graph_transformed[1][0][1]).values())
         self.assertEqual(unique_label_counts_before, unique_label_counts_after)
 
@@ -44,7 +51,7 @@ class WeisfeilerLehmanTests(unittest.TestCase):
         self.assertEqual(wl._preprocess_relabel_dict, expected_preprocessing_relabeling)
 
         # First iteration relabeling
-        expected_relabeling = { '0-1-2-3': 0, '1-0-2': 1, '2-0-1-3': 2, '3-0-2-4-4': 3, '4-3': 4, '1-0-3': 5, '3-0-1-2-4': 6, '1-2': 7}
+        expected_relabeling = { (0,1,2,3): 0, (1,0,2): 1, (2,0,1,3): 2, (3,0,2,4,4): 3, (4,3): 4, (1,0,3): 5, (3,0,1,2,4): 6, (1,2): 7}
         self.assertEqual(expected_relabeling, wl._label_dict)
 
         # Check results
@@ -60,7 +67,7 @@ class WeisfeilerLehmanTests(unittest.TestCase):
         self.assertEqual(expected_labels_graph_2, graph_transformed[1][1][1])
         
         # Expected sorted label counts before  and after WL iteration
-        unique_label_counts_before = sorted(Counter([ '-'.join(np.asarray(x).astype(str)) for x in graph_transformed[1][0][0]]).values())
+        unique_label_counts_before = sorted(Counter([ tuple(x) for x in graph_transformed[1][0][0]]).values())
         unique_label_counts_after = sorted(Counter(graph_transformed[1][0][1]).values())
         self.assertEqual(unique_label_counts_before, unique_label_counts_after)
 
@@ -80,9 +87,9 @@ class WeisfeilerLehmanTests(unittest.TestCase):
         # Assemble mapped vector
         possible_mapped_labels = wl._label_dict.keys()
         counts_mapped_labels_graph_1 = []
-        mapped_label_counts_graph_1 = Counter([ '-'.join(np.asarray(x).astype(str)) for x in graph_transformed[1][0][0]])
+        mapped_label_counts_graph_1 = Counter([ tuple(x) for x in graph_transformed[1][0][0]])
         counts_mapped_labels_graph_2 = []
-        mapped_label_counts_graph_2 = Counter([ '-'.join(np.asarray(x).astype(str)) for x in graph_transformed[1][1][0]])
+        mapped_label_counts_graph_2 = Counter([ tuple(x) for x in graph_transformed[1][1][0]])
 
         for label in possible_mapped_labels:
             counts_mapped_labels_graph_1.append(mapped_label_counts_graph_1[label])